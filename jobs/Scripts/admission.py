@@ -0,0 +1,65 @@
+import os
+import shutil
+import threading
+
+from cost_model import CaseResources
+
+from jobs_launcher.core.config import main_logger
+
+
+def get_available_memory() -> int:
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        # memory isn't limited if it can't be measured
+        return 2 ** 62
+
+
+class AdmissionController:
+    """Start cases only while their estimated resources are available.
+
+    Budgets are taken from free disk space of results, free memory and the
+    number of cores when the run starts. A case which doesn't fit waits
+    until other cases finish. A case which exceeds budgets on its own runs
+    when nothing else runs.
+    """
+
+    def __init__(self, path: str, *, disk_reserve: int = 0,
+                 memory_reserve: int = 0):
+        self.budget = CaseResources(
+            disk=max(0, shutil.disk_usage(path).free - disk_reserve),
+            memory=max(0, get_available_memory() - memory_reserve),
+            cpu=float(os.cpu_count() or 1)
+        )
+        self.used = CaseResources(0, 0, 0.0)
+        self.running = 0
+        self._condition = threading.Condition()
+
+        main_logger.info(
+            f"Admission budget: disk {self.budget.disk / 1024 ** 3:.1f} GB, "
+            f"memory {self.budget.memory / 1024 ** 3:.1f} GB, cpu {self.budget.cpu:.0f}"  # noqa: E501
+        )
+
+    def _fits(self, resources: CaseResources) -> bool:
+        return all(
+            used + needed <= budget
+            for used, needed, budget in zip(self.used, resources, self.budget)
+        )
+
+    def acquire(self, name: str, resources: CaseResources) -> None:
+        with self._condition:
+            if not self._fits(resources):
+                main_logger.info(f"Case {name} waits for resources: {resources}")  # noqa: E501
+
+            self._condition.wait_for(
+                lambda: self.running == 0 or self._fits(resources)
+            )
+
+            self.used = CaseResources(*(x + y for x, y in zip(self.used, resources)))  # noqa: E501
+            self.running += 1
+
+    def release(self, resources: CaseResources) -> None:
+        with self._condition:
+            self.used = CaseResources(*(x - y for x, y in zip(self.used, resources)))  # noqa: E501
+            self.running -= 1
+            self._condition.notify_all()
@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import traceback
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# set jobs_test_xilinx as a root dir for project
+ROOT_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.path.pardir, os.path.pardir)
+)
+sys.path.append(ROOT_PATH)
+
+from bench_stats import parity_verdict, summarize  # noqa: E402
+from decoder import get_decoder_pix_fmt, get_decoder_video_size  # noqa: E402
+from encoder import run_tool  # noqa: E402
+from process_results import get_ffprobe_info  # noqa: E402
+from run_tests import prepare_input, prepare_parameters, select_tools  # noqa: E402, E501
+from scaler import get_input_format, get_scaler_outputs  # noqa: E402
+from supervisor import get_tool_timeout  # noqa: E402
+from utils import (copy_test_cases, get_file_hash,  # noqa: E402
+                   is_case_skipped, remove_artifact)
+from yuv_compare import get_frame_size  # noqa: E402
+
+from jobs_launcher.core.config import main_logger  # noqa: E402
+from jobs_launcher.core.system_info import get_gpu  # noqa: E402
+
+# format of the baseline file. Files of other versions aren't read
+BASELINE_VERSION = 1
+RESULTS_NAME = "bench_results.json"
+
+
+def createArgsParser():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--output", required=True, metavar="<dir>")
+    parser.add_argument("--test_group", required=True)
+    parser.add_argument("--test_cases", required=False, default="")
+    parser.add_argument("--runs", required=False, default=5, type=int)
+    parser.add_argument("--warmup", required=False, default=1, type=int)
+    # file with measurements of builds
+    parser.add_argument("--baseline", required=True)
+    # name of the measured build. Hashes of tools are used by default
+    parser.add_argument("--build", required=False, default="")
+    # build to compare with. The last saved build is used by default
+    parser.add_argument("--reference", required=False, default="")
+    # store measurements of the build in the baseline file
+    parser.add_argument("--save", required=False, action="store_true")
+    # relative slowdown which is considered as regression
+    parser.add_argument("--threshold", required=False, default=0.03, type=float)  # noqa: E501
+    parser.add_argument("--tool_timeout", required=False, default=600, type=float)  # noqa: E501
+    parser.add_argument("--shard", required=False, default="")
+    parser.add_argument("--shard_history", required=False, default="")
+    parser.add_argument("--input_frames", required=False, default=60, type=int)  # noqa: E501
+    parser.add_argument("--input_pattern", required=False, default="gradient",
+                        choices=["gradient", "bars", "noise"])
+    parser.set_defaults(tools="SimpleSamples")
+
+    return parser
+
+
+def count_frames(args, case: Dict[str, Any], input_stream: str,
+                 output_stream: str) -> int:
+    """Get number of frames processed by tools of a case.
+
+    Frame counts aren't set in cases, so they're taken from sizes of raw
+    streams or from packets of encoded output of transcoders.
+    """
+    if "Encoder" in args.test_group:
+        keys = case['simple_parameters'].split()
+        width, height = keys[keys.index('--size')+1].split('x')
+        frame_size = get_frame_size(int(width), int(height))
+        return os.path.getsize(input_stream) // frame_size
+    elif "Decoder" in args.test_group:
+        width, height = get_decoder_video_size(case).split('x')
+        frame_size = get_frame_size(int(width), int(height), get_decoder_pix_fmt(case))  # noqa: E501
+        return os.path.getsize(output_stream) // frame_size
+    elif "Scaler" in args.test_group:
+        frame_size = get_frame_size(*get_input_format(case['xma_parameters']))  # noqa: E501
+        return os.path.getsize(input_stream) // frame_size
+    else:
+        info = get_ffprobe_info(case, output_stream, depth='packets')
+        return int(info['streams'][0]['nb_read_packets'])
+
+
+def bench_case(args, case: Dict[str, Any],
+               tools: Dict[str, str]) -> Dict[str, Any]:
+    """Measure fps of simple and ma35 tools of a case over several runs.
+
+    Runs of the tools alternate, so drift of the machine state affects both
+    of them. Warmup runs are discarded.
+    """
+    logs_path = os.path.join(args.output, "tool_logs")
+    output_path = os.path.join(args.output, "Color")
+    error_messages = set()
+
+    prepared_keys, ma35_prepared_keys, input_stream, output_stream, reference_stream = prepare_parameters(  # noqa: E501
+        args, case, output_path
+    )
+
+    if "Scaler" not in args.test_group:
+        prepare_input(
+            args, case, tools.get("encoder"), input_stream,
+            os.path.join(logs_path, f"{case['case']}_input_preparation.log"),  # noqa: E501
+            error_messages,
+            timeout=get_tool_timeout(case.get('prepare', ''), args.tool_timeout)  # noqa: E501
+        )
+
+    runs = {
+        "simple": (tools["simple"], prepared_keys),
+        "ma35": (tools["ma35"], ma35_prepared_keys)
+    }
+    wall_times = {name: [] for name in runs}
+
+    for index in range(args.warmup + args.runs):
+        # scalers read input dumped by the simple tool
+        for name, (tool, keys) in runs.items():
+            usage = {}
+            run_tool(tool, keys, os.path.join(logs_path, f"{case['case']}_{name}_bench.log"),  # noqa: E501
+                     error_messages,
+                     timeout=get_tool_timeout(keys, args.tool_timeout),
+                     usage=usage)
+            if index >= args.warmup:
+                wall_times[name].append(usage["wall_time"])
+
+    frames = count_frames(args, case, input_stream, output_stream)
+    if not frames:
+        main_logger.warning(f"Couldn't count frames of case {case['case']}, fps isn't measured")  # noqa: E501
+
+    result = {"frames": frames}
+    for name, values in wall_times.items():
+        result[name] = [frames / x for x in values if frames and x > 0]
+
+    streams = [input_stream]
+    if "Scaler" in args.test_group:
+        # each output of scalers is a separate file
+        for output in get_scaler_outputs(case, output_stream, reference_stream):  # noqa: E501
+            streams += [output.simple, output.ma35]
+    else:
+        streams += [output_stream, reference_stream]
+
+    for stream in streams:
+        remove_artifact(stream)
+
+    return result
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"version": BASELINE_VERSION, "builds": {}}
+
+    with open(path, "r") as file:
+        baseline = json.load(file)
+
+    if baseline.get("version") != BASELINE_VERSION:
+        raise ValueError(
+            f"Baseline {path} has version {baseline.get('version')}, expected {BASELINE_VERSION}"  # noqa: E501
+        )
+
+    return baseline
+
+
+def save_baseline(path: str, baseline: Dict[str, Any]) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(baseline, file, indent=4)
+    os.replace(temp_path, path)
+
+
+def select_reference(args, baseline: Dict[str, Any],
+                     build: str) -> Optional[str]:
+    if args.reference:
+        return args.reference if args.reference in baseline["builds"] else None  # noqa: E501
+
+    candidates = [
+        (data["date_time"], name)
+        for name, data in baseline["builds"].items()
+        if name != build and args.test_group in data["groups"]
+    ]
+
+    return max(candidates)[1] if candidates else None
+
+
+def compare_with_reference(args, results: Dict[str, Dict[str, Any]],
+                           reference: Dict[str, Any]) -> List[str]:
+    """Add comparison with reference to results and get found regressions."""
+    regressions = []
+
+    for case_name, result in results.items():
+        reference_result = reference.get(case_name)
+        if not reference_result:
+            continue
+
+        result["comparison"] = {}
+        for tool in ("simple", "ma35"):
+            if not result[tool] or not reference_result[tool]:
+                continue
+
+            verdict = parity_verdict(result[tool], reference_result[tool], args.threshold)  # noqa: E501
+            result["comparison"][tool] = verdict
+
+            if verdict["verdict"] == "different" and verdict["relative_difference"] < 0:  # noqa: E501
+                message = f"{case_name} ({tool}): fps dropped by {-verdict['relative_difference']:.1%}"  # noqa: E501
+                if verdict["ci_low"] is not None:
+                    message += f" (95% CI: {verdict['ci_low']:.1%}..{verdict['ci_high']:.1%})"  # noqa: E501
+                regressions.append(message)
+
+    return regressions
+
+
+def run_bench(args) -> int:
+    rc = 0
+
+    os.makedirs(os.path.join(args.output, "Color"), exist_ok=True)
+    os.makedirs(os.path.join(args.output, "tool_logs"), exist_ok=True)
+
+    render_device = get_gpu()
+    system_pl = platform.system()
+    current_conf = set(system_pl) if not render_device else {system_pl, render_device}  # noqa: E501
+
+    copy_test_cases(args)
+    with open(os.path.join(args.output, "test_cases.json"), "r") as file:
+        cases = json.load(file)
+
+    tools = select_tools(args)
+    tool_hashes = {name: get_file_hash(path) for name, path in sorted(tools.items())}  # noqa: E501
+    build = args.build or "-".join(tool_hashes[x][:8] for x in ("simple", "ma35"))  # noqa: E501
+
+    results = {}
+    for case in cases:
+        if is_case_skipped(case, current_conf):
+            continue
+
+        main_logger.info(f"Benchmark case {case['case']}")
+        try:
+            results[case["case"]] = bench_case(args, case, tools)
+        except Exception as e:
+            main_logger.error(f"Failed to benchmark case {case['case']}: {str(e)}")  # noqa: E501
+            main_logger.error(f"Traceback: {traceback.format_exc()}")
+            rc = -1
+
+    baseline = load_baseline(args.baseline)
+    reference = select_reference(args, baseline, build)
+
+    regressions = []
+    if reference:
+        regressions = compare_with_reference(
+            args, results,
+            baseline["builds"][reference]["groups"].get(args.test_group, {})
+        )
+        main_logger.info(f"Build {build} is compared with {reference}")
+    else:
+        main_logger.warning("There is no reference build to compare with")
+
+    for message in regressions:
+        main_logger.error(f"Performance regression: {message}")
+
+    report = {
+        "build": build,
+        "reference": reference,
+        "test_group": args.test_group,
+        "regressions": regressions,
+        "cases": {
+            name: dict(
+                result,
+                simple=summarize(result["simple"]),
+                ma35=summarize(result["ma35"])
+            )
+            for name, result in results.items()
+        }
+    }
+    with open(os.path.join(args.output, RESULTS_NAME), "w") as file:
+        json.dump(report, file, indent=4)
+
+    if args.save:
+        build_data = baseline["builds"].setdefault(build, {"groups": {}})
+        build_data["date_time"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')  # noqa: E501
+        build_data["tools"] = tool_hashes
+        build_data["groups"].setdefault(args.test_group, {}).update({
+            name: {key: result[key] for key in ("frames", "simple", "ma35")}
+            for name, result in results.items()
+        })
+        save_baseline(args.baseline, baseline)
+        main_logger.info(f"Build {build} is saved to {args.baseline}")
+
+    if regressions and rc == 0:
+        rc = 1
+
+    return rc
+
+
+if __name__ == '__main__':
+    args = createArgsParser().parse_args()
+    exit(run_bench(args))
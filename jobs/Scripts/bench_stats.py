@@ -0,0 +1,126 @@
+import math
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+
+# two-sided 95% critical values of Student's t distribution by degrees of
+# freedom. Missing values are taken from the nearest smaller df, which
+# makes intervals slightly wider
+T_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365,
+    8: 2.306, 9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160,
+    14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093,
+    20: 2.086, 25: 2.060, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980
+}
+Z_95 = 1.960
+
+
+def t_critical(df: float) -> float:
+    """Get two-sided 95% critical value of t distribution."""
+    if df < 1:
+        return math.inf
+    if df > 1000:
+        return Z_95
+    return T_95[max(x for x in T_95 if x <= df)]
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Get q-th percentile (0-100) with linear interpolation."""
+    values = sorted(samples)
+    position = (len(values) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)  # noqa: E501
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Get statistics of samples.
+
+    Returns:
+        Dict[str, Any]: number of samples, mean, median, p95, standard
+            deviation and bounds of 95% confidence interval of the mean
+            (None if there are less than two samples)
+    """
+    if not samples:
+        return {'runs': 0}
+
+    mean = statistics.fmean(samples)
+    summary = {
+        'runs': len(samples),
+        'mean': mean,
+        'median': statistics.median(samples),
+        'p95': percentile(samples, 95),
+        'stdev': 0.0,
+        'ci_low': None,
+        'ci_high': None,
+        'samples': samples
+    }
+
+    if len(samples) > 1:
+        stdev = statistics.stdev(samples)
+        half_width = t_critical(len(samples) - 1) * stdev / math.sqrt(len(samples))  # noqa: E501
+        summary['stdev'] = stdev
+        summary['ci_low'] = mean - half_width
+        summary['ci_high'] = mean + half_width
+
+    return summary
+
+
+def welch_interval(samples_1: List[float],
+                   samples_2: List[float]) -> Tuple[float, Optional[float]]:
+    """Get difference of means and half width of its 95% confidence interval.
+
+    Welch's approximation is used, so variances of samples may differ.
+    Half width is None if any of samples has less than two values.
+    """
+    mean_1 = statistics.fmean(samples_1)
+    mean_2 = statistics.fmean(samples_2)
+    difference = mean_1 - mean_2
+
+    if len(samples_1) < 2 or len(samples_2) < 2:
+        return difference, None
+
+    error_1 = statistics.variance(samples_1) / len(samples_1)
+    error_2 = statistics.variance(samples_2) / len(samples_2)
+    standard_error = math.sqrt(error_1 + error_2)
+    if standard_error == 0:
+        return difference, 0.0
+
+    df = (error_1 + error_2) ** 2 / (
+        error_1 ** 2 / (len(samples_1) - 1) + error_2 ** 2 / (len(samples_2) - 1)  # noqa: E501
+    )
+
+    return difference, t_critical(df) * standard_error
+
+
+def parity_verdict(samples: List[float], reference: List[float],
+                   tolerance: float) -> Dict[str, Any]:
+    """Check if samples are on par with reference within relative tolerance.
+
+    Verdict is 'parity' if the whole confidence interval of the relative
+    difference of means lies within tolerance, 'different' if it lies out
+    of it and 'inconclusive' otherwise. Point estimates are compared if
+    there aren't enough samples to build the interval.
+    """
+    reference_mean = statistics.fmean(reference)
+    difference, half_width = welch_interval(samples, reference)
+
+    relative = difference / reference_mean
+    relative_half_width = (half_width or 0.0) / reference_mean
+
+    low = relative - relative_half_width
+    high = relative + relative_half_width
+
+    if -tolerance <= low and high <= tolerance:
+        verdict = 'parity'
+    elif high < -tolerance or low > tolerance:
+        verdict = 'different'
+    else:
+        verdict = 'inconclusive'
+
+    return {
+        'verdict': verdict,
+        'relative_difference': relative,
+        'ci_low': low if half_width is not None else None,
+        'ci_high': high if half_width is not None else None,
+        'tolerance': tolerance
+    }
@@ -0,0 +1,320 @@
+import hashlib
+import os
+import struct
+from itertools import zip_longest
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple  # noqa: E501
+
+# streams are read chunk by chunk, so memory use doesn't depend on their size
+READ_CHUNK_SIZE = 4 * 1024 * 1024
+# bytes of a NAL unit or IVF frame which are parsed to get its type
+HEADER_SIZE = 64
+IVF_HEADER_SIZE = 1024
+# frames with different sizes which are listed in the result
+MAX_REPORTED_FRAMES = 100
+
+START_CODE = b'\x00\x00\x01'
+
+H264_SLICE_TYPES = ('P', 'B', 'I', 'SP', 'SI')
+# NAL units which start a new access unit if they follow a slice
+H264_PREFIX_TYPES = {6, 7, 8, 9, 14, 15, 16, 17, 18}
+H264_NAL_TYPES = {
+    1: 'SLICE', 5: 'IDR', 6: 'SEI', 7: 'SPS', 8: 'PPS', 9: 'AUD',
+    10: 'END_SEQ', 11: 'END_STREAM', 12: 'FILLER'
+}
+
+H265_PREFIX_TYPES = {32, 33, 34, 35, 39, 41, 42, 43, 44} | set(range(48, 56))
+H265_NAL_TYPES = {
+    0: 'TRAIL_N', 1: 'TRAIL_R', 2: 'TSA_N', 3: 'TSA_R', 4: 'STSA_N',
+    5: 'STSA_R', 6: 'RADL_N', 7: 'RADL_R', 8: 'RASL_N', 9: 'RASL_R',
+    16: 'BLA_W_LP', 17: 'BLA_W_RADL', 18: 'BLA_N_LP', 19: 'IDR_W_RADL',
+    20: 'IDR_N_LP', 21: 'CRA', 32: 'VPS', 33: 'SPS', 34: 'PPS', 35: 'AUD',
+    36: 'EOS', 37: 'EOB', 38: 'FD', 39: 'PREFIX_SEI', 40: 'SUFFIX_SEI'
+}
+
+AV1_FRAME_TYPES = ('KEY', 'INTER', 'INTRA_ONLY', 'SWITCH')
+AV1_FRAME_OBUS = {3, 6}
+
+
+class Frame(NamedTuple):
+    """Access unit of H.264/H.265 stream or frame of IVF file."""
+    size: int
+    sha1: str
+    type: str
+    # (type, size, sha1) of NAL units of access units
+    units: List[Tuple[str, int, str]]
+
+
+class BitReader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def read(self, count: int = 1) -> int:
+        value = 0
+        for _ in range(count):
+            byte = self.data[self.position // 8]
+            value = (value << 1) | ((byte >> (7 - self.position % 8)) & 1)
+            self.position += 1
+        return value
+
+    def read_ue(self) -> int:
+        # exp-Golomb code
+        zeros = 0
+        while self.read() == 0:
+            zeros += 1
+        return (1 << zeros) - 1 + self.read(zeros)
+
+
+def _remove_emulation_prevention(data: bytes) -> bytes:
+    return data.replace(b'\x00\x00\x03', b'\x00\x00')
+
+
+def _parse_h264(header: bytes) -> Tuple[bool, bool, bool, str]:
+    nal_type = header[0] & 0x1f
+    name = H264_NAL_TYPES.get(nal_type, f'NAL_{nal_type}')
+
+    if nal_type not in (1, 5):
+        return False, False, nal_type in H264_PREFIX_TYPES, name
+
+    reader = BitReader(_remove_emulation_prevention(header[1:]))
+    try:
+        first_mb = reader.read_ue()
+        slice_type = H264_SLICE_TYPES[reader.read_ue() % 5]
+    except IndexError:
+        return True, False, False, name
+
+    return True, first_mb == 0, False, f'{name} {slice_type}'
+
+
+def _parse_h265(header: bytes) -> Tuple[bool, bool, bool, str]:
+    nal_type = (header[0] >> 1) & 0x3f
+    name = H265_NAL_TYPES.get(nal_type, f'NAL_{nal_type}')
+
+    if nal_type < 32:
+        first_slice = len(header) > 2 and bool(header[2] & 0x80)
+        return True, first_slice, False, name
+
+    return False, False, nal_type in H265_PREFIX_TYPES, name
+
+
+def _scan_annexb(file: BinaryIO) -> Iterator[Tuple[Optional[bytes], bytes]]:
+    """Split Annex B stream into NAL units without holding them in memory.
+
+    Yields:
+        Tuple[Optional[bytes], bytes]: first bytes of a NAL unit when it
+            starts, otherwise None, and the next bytes of the stream
+    """
+    buffer, position, eof = b'', 0, False
+    view = memoryview(buffer)
+
+    while True:
+        index = buffer.find(START_CODE, position)
+
+        # the header of a NAL unit is parsed only if it's read in full
+        if index == -1 or (not eof and index + len(START_CODE) + HEADER_SIZE > len(buffer)):  # noqa: E501
+            if eof:
+                if position < len(buffer):
+                    yield None, view[position:]
+                return
+
+            # the last bytes can be the beginning of a start code
+            keep = index if index != -1 else max(position, len(buffer) - len(START_CODE) + 1)  # noqa: E501
+            if keep > position:
+                yield None, view[position:keep]
+
+            chunk = file.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer, position = buffer[keep:] + chunk, 0
+            view = memoryview(buffer)
+            continue
+
+        if index > position:
+            yield None, view[position:index]
+        position = index + len(START_CODE)
+        yield buffer[position:position+HEADER_SIZE], START_CODE
+
+
+def iterate_access_units(path: str, codec: str) -> Iterator[Frame]:
+    """Split H.264 or H.265 stream into access units.
+
+    Only NAL units are hashed, hash of an access unit is taken from hashes
+    of its NAL units.
+    """
+    parse = _parse_h264 if codec == 'h264' else _parse_h265
+
+    units: List[Tuple[str, int, str]] = []
+    frame_type, has_slice = '', False
+    unit_hash, unit_size, unit_type = hashlib.sha1(), 0, ''
+
+    def _get_frame() -> Frame:
+        frame_hash = hashlib.sha1(''.join(x[2] for x in units).encode())
+        return Frame(sum(x[1] for x in units), frame_hash.hexdigest(), frame_type, units)  # noqa: E501
+
+    with open(path, 'rb') as file:
+        for header, data in _scan_annexb(file):
+            if header is not None:
+                if unit_size:
+                    units.append((unit_type, unit_size, unit_hash.hexdigest()))  # noqa: E501
+                is_slice, first_slice, is_prefix, unit_type = parse(header)
+                unit_hash, unit_size = hashlib.sha1(), 0
+
+                if has_slice and (is_prefix or first_slice):
+                    yield _get_frame()
+                    units, frame_type, has_slice = [], '', False
+
+                if is_slice and not has_slice:
+                    frame_type = unit_type
+                has_slice = has_slice or is_slice
+
+            unit_hash.update(data)
+            unit_size += len(data)
+
+    if unit_size:
+        units.append((unit_type, unit_size, unit_hash.hexdigest()))
+    if units:
+        yield _get_frame()
+
+
+def _get_av1_frame_type(data: bytes) -> str:
+    position = 0
+    while position < len(data):
+        obu_type = (data[position] >> 3) & 0xf
+        has_extension = data[position] & 0x4
+        has_size = data[position] & 0x2
+        position += 2 if has_extension else 1
+
+        size = len(data) - position
+        if has_size:
+            # leb128
+            size, shift = 0, 0
+            while position < len(data):
+                byte = data[position]
+                position += 1
+                size |= (byte & 0x7f) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+
+        if obu_type in AV1_FRAME_OBUS and position < len(data):
+            # reduced still picture headers aren't expected in videos
+            reader = BitReader(data[position:])
+            if reader.read():
+                return 'SHOW_EXISTING'
+            return AV1_FRAME_TYPES[reader.read(2)]
+
+        position += size
+
+    return ''
+
+
+def _get_vp9_frame_type(data: bytes) -> str:
+    reader = BitReader(data)
+    reader.read(2)
+    profile = reader.read() | (reader.read() << 1)
+    if profile == 3:
+        reader.read()
+    if reader.read():
+        return 'SHOW_EXISTING'
+    return 'NON_KEY' if reader.read() else 'KEY'
+
+
+def iterate_ivf_frames(path: str) -> Iterator[Frame]:
+    with open(path, 'rb') as file:
+        header = file.read(32)
+        if len(header) < 32 or header[:4] != b'DKIF':
+            raise ValueError(f"{path} isn't IVF file")
+
+        fourcc = header[8:12]
+        file.seek(struct.unpack('<H', header[6:8])[0])
+
+        while True:
+            frame_header = file.read(12)
+            if len(frame_header) < 12:
+                return
+
+            size = struct.unpack('<I', frame_header[:4])[0]
+            frame_hash = hashlib.sha1()
+            frame_type = ''
+            remaining = size
+
+            while remaining:
+                chunk = file.read(min(remaining, READ_CHUNK_SIZE))
+                if not chunk:
+                    break
+                if remaining == size:
+                    try:
+                        if fourcc == b'AV01':
+                            frame_type = _get_av1_frame_type(chunk[:IVF_HEADER_SIZE])  # noqa: E501
+                        elif fourcc == b'VP90':
+                            frame_type = _get_vp9_frame_type(chunk[:IVF_HEADER_SIZE])  # noqa: E501
+                    except IndexError:
+                        pass
+                frame_hash.update(chunk)
+                remaining -= len(chunk)
+
+            yield Frame(size, frame_hash.hexdigest(), frame_type, [])
+
+
+def iterate_frames(path: str) -> Iterator[Frame]:
+    extension = os.path.splitext(path)[1].lstrip('.')
+    if extension == 'ivf':
+        return iterate_ivf_frames(path)
+    elif extension in ('h264', 'h265'):
+        return iterate_access_units(path, extension)
+    raise ValueError(f"Unsupported stream {path}")
+
+
+def locate_bitstream_difference(stream_1: str, stream_2: str) -> Dict[str, Any]:  # noqa: E501
+    """Find where two encoded streams diverge without decoding them.
+
+    Streams are split into access units (H.264, H.265) or IVF frames and
+    compared frame by frame.
+
+    Returns:
+        Dict[str, Any]: number of frames and sizes of both streams, number
+            of differing frames, the first differing frame with its type and
+            its first differing NAL unit, and sizes of frames which differ
+            in size
+    """
+    result = {
+        'frames_1': 0, 'frames_2': 0,
+        'size_1': os.path.getsize(stream_1), 'size_2': os.path.getsize(stream_2),  # noqa: E501
+        'differing_frames': 0, 'first_frame': None,
+        'frame_type_1': None, 'frame_type_2': None,
+        'first_unit': None, 'unit_type_1': None, 'unit_type_2': None,
+        'frame_size_deltas': []
+    }
+    result['size_delta'] = result['size_2'] - result['size_1']
+
+    frames = zip_longest(iterate_frames(stream_1), iterate_frames(stream_2))
+    for index, (frame_1, frame_2) in enumerate(frames):
+        result['frames_1'] += frame_1 is not None
+        result['frames_2'] += frame_2 is not None
+
+        if frame_1 and frame_2 and frame_1.sha1 == frame_2.sha1:
+            continue
+
+        result['differing_frames'] += 1
+        size_1 = frame_1.size if frame_1 else 0
+        size_2 = frame_2.size if frame_2 else 0
+
+        if size_1 != size_2 and len(result['frame_size_deltas']) < MAX_REPORTED_FRAMES:  # noqa: E501
+            result['frame_size_deltas'].append({
+                'frame': index, 'size_1': size_1, 'size_2': size_2,
+                'delta': size_2 - size_1
+            })
+
+        if result['first_frame'] is None:
+            result['first_frame'] = index
+            result['frame_type_1'] = frame_1.type if frame_1 else None
+            result['frame_type_2'] = frame_2.type if frame_2 else None
+
+            units = zip_longest(frame_1.units if frame_1 else [], frame_2.units if frame_2 else [])  # noqa: E501
+            for unit_index, (unit_1, unit_2) in enumerate(units):
+                if unit_1 != unit_2:
+                    result['first_unit'] = unit_index
+                    result['unit_type_1'] = unit_1[0] if unit_1 else None
+                    result['unit_type_2'] = unit_2[0] if unit_2 else None
+                    break
+
+    return result
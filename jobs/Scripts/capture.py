@@ -0,0 +1,100 @@
+import errno
+import hashlib
+import os
+import stat
+import threading
+import time
+from contextlib import nullcontext
+
+from jobs_launcher.core.config import main_logger
+
+CAPTURE_CHUNK_SIZE = 4 * 1024 * 1024
+# captured data is written next to the pipe with this suffix
+SPILL_SUFFIX = '.spill'
+
+
+def create_fifo(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+    os.mkfifo(path)
+
+
+def remove_fifos(directory: str, prefix: str) -> None:
+    # a named pipe without a writer blocks anyone who tries to read it,
+    # so pipes of failed cases must not stay in results. Spilled data of
+    # failed tools is useless too
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not name.startswith(prefix):
+            continue
+        if stat.S_ISFIFO(os.lstat(path).st_mode) or name.endswith(SPILL_SUFFIX):  # noqa: E501
+            os.remove(path)
+
+
+class FifoCapture(threading.Thread):
+    """Hash the data which a tool writes into a named pipe.
+
+    The pipe must be created with create_fifo before the tool starts. The
+    reading thread blocks until the tool opens the pipe, so finish() must
+    be called after the tool exits even if it failed.
+
+    If spill is set, the data is also written to a file next to the pipe.
+    keep() puts it in place of the pipe (e.g. if outputs differ), so tools
+    don't have to run again to get their outputs on disk.
+    """
+
+    def __init__(self, path: str, spill: bool = False):
+        super().__init__(daemon=True, name=f"capture-{os.path.basename(path)}")
+        self.path = path
+        self.spill_path = path + SPILL_SUFFIX if spill else None
+        self.size = 0
+        self.error = None
+        self._hasher = hashlib.sha1()
+
+    @property
+    def sha1(self) -> str:
+        return self._hasher.hexdigest()
+
+    def run(self) -> None:
+        try:
+            with open(self.path, 'rb') as fifo, \
+                    (open(self.spill_path, 'wb') if self.spill_path else nullcontext()) as spill:  # noqa: E501
+                while True:
+                    chunk = fifo.read(CAPTURE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    self._hasher.update(chunk)
+                    self.size += len(chunk)
+                    if spill:
+                        spill.write(chunk)
+        except Exception as e:
+            self.error = e
+
+    def finish(self) -> None:
+        # the tool could exit without opening the pipe. Open its writing end
+        # to let the reading thread get EOF
+        while self.is_alive():
+            try:
+                os.close(os.open(self.path, os.O_WRONLY | os.O_NONBLOCK))
+            except OSError as e:
+                # reading thread didn't open the pipe yet
+                if e.errno != errno.ENXIO:
+                    raise
+                time.sleep(0.01)
+            self.join(timeout=0.1)
+
+        if self.error:
+            main_logger.error(f"Failed to capture {self.path}: {self.error}")
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def keep(self) -> None:
+        """Put spilled data to the path of the pipe."""
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.replace(self.spill_path, self.path)
+
+    def discard(self) -> None:
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+from contextlib import suppress
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MATRIX_NAME = "test_cases.matrix.json"
+INDEX_SUFFIX = ".index.json"
+MATRIX_VERSION = 1
+
+# keys of a matrix which describe the matrix itself. Other keys are fields
+# of cases, strings in them are templates
+MATRIX_KEYS = ("version", "axes", "order")
+# templates can refer to fields of axes which are templates too
+MAX_RENDER_DEPTH = 3
+
+Coordinates = Dict[str, int]
+
+
+def load_matrix(path: str) -> Dict[str, Any]:
+    with open(path, "r") as file:
+        matrix = json.load(file)
+
+    if matrix.get("version") != MATRIX_VERSION:
+        raise ValueError(
+            f"Matrix {path} has version {matrix.get('version')}, expected {MATRIX_VERSION}"  # noqa: E501
+        )
+
+    return matrix
+
+
+def _parse_axis(entry: str) -> Tuple[str, str]:
+    # 'rc:plain_rc' binds values of axis 'plain_rc' to variable 'rc'
+    variable, _, axis = entry.partition(":")
+    return variable, axis or variable
+
+
+def _iterate_order(matrix: Dict[str, Any], order: List[Any],
+                   coordinates: Coordinates) -> Iterator[Coordinates]:
+    if not order:
+        yield dict(coordinates)
+        return
+
+    entry, rest = order[0], order[1:]
+
+    if isinstance(entry, list):
+        # blocks are expanded one after another, each block is followed by
+        # the rest of the order
+        for block in entry:
+            for block_coordinates in _iterate_order(matrix, block, coordinates):  # noqa: E501
+                yield from _iterate_order(matrix, rest, block_coordinates)
+        return
+
+    variable, axis = _parse_axis(entry)
+    for value_index in range(len(matrix["axes"][axis])):
+        coordinates[f"{variable}:{axis}"] = value_index
+        yield from _iterate_order(matrix, rest, coordinates)
+        del coordinates[f"{variable}:{axis}"]
+
+
+def iterate_coordinates(matrix: Dict[str, Any]) -> Iterator[Coordinates]:
+    """Lazily get positions of cases on axes of a matrix in order of cases.
+
+    Coordinates map 'variable:axis' to the index of a value of the axis.
+    """
+    yield from _iterate_order(matrix, matrix["order"], {})
+
+
+def _get_context(matrix: Dict[str, Any], index: int,
+                 coordinates: Coordinates) -> Dict[str, Any]:
+    context = {"index": index}
+    for key, value_index in coordinates.items():
+        variable, axis = key.split(":")
+        value = matrix["axes"][axis][value_index]
+        context[variable] = SimpleNamespace(**value) if isinstance(value, dict) else value  # noqa: E501
+    return context
+
+
+def _render(template: str, context: Dict[str, Any]) -> str:
+    for _ in range(MAX_RENDER_DEPTH):
+        if "{" not in template:
+            break
+        template = template.format_map(context)
+    return template
+
+
+def _get_case_name(matrix: Dict[str, Any], index: int,
+                   coordinates: Coordinates) -> str:
+    return _render(matrix["case"], _get_context(matrix, index, coordinates))
+
+
+def render_case(matrix: Dict[str, Any], index: int,
+                coordinates: Coordinates) -> Dict[str, Any]:
+    """Materialize one case of a matrix.
+
+    Args:
+        matrix (Dict[str, Any]): Loaded matrix
+        index (int): Number of the case in the matrix starting from 1
+        coordinates (Coordinates): Position of the case on axes
+    """
+    context = _get_context(matrix, index, coordinates)
+    case = {}
+
+    for field, value in matrix.items():
+        if field in MATRIX_KEYS:
+            continue
+        if isinstance(value, str):
+            case[field] = _render(value, context)
+        elif isinstance(value, list) and all(isinstance(x, str) for x in value):  # noqa: E501
+            case[field] = [_render(x, context) for x in value]
+        else:
+            case[field] = value
+
+    return case
+
+
+def expand_matrix(matrix: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Lazily materialize all cases of a matrix."""
+    for index, coordinates in enumerate(iterate_coordinates(matrix), start=1):  # noqa: E501
+        yield render_case(matrix, index, coordinates)
+
+
+def get_index(path: str) -> Dict[str, Tuple[int, Coordinates]]:
+    """Get number and coordinates of each case of a matrix by case name.
+
+    The index is cached next to the matrix and rebuilt when the matrix
+    changes.
+    """
+    with open(path, "rb") as file:
+        source_hash = hashlib.sha1(file.read()).hexdigest()
+
+    index_path = path + INDEX_SUFFIX
+    with suppress(OSError, ValueError):
+        with open(index_path, "r") as file:
+            cached = json.load(file)
+        if cached["source"] == source_hash:
+            return {name: tuple(value) for name, value in cached["cases"].items()}  # noqa: E501
+
+    matrix = load_matrix(path)
+    index = {
+        _get_case_name(matrix, number, coordinates): (number, coordinates)
+        for number, coordinates in enumerate(iterate_coordinates(matrix), start=1)  # noqa: E501
+    }
+
+    # the index is only a cache, so read-only checkouts work without it
+    with suppress(OSError):
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"source": source_hash, "cases": index}, file)
+        os.replace(temp_path, index_path)
+
+    return index
+
+
+def load_cases(path: str,
+               names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Materialize the selected cases of a matrix in order of the matrix.
+
+    All cases are materialized if names aren't given.
+    """
+    matrix = load_matrix(path)
+
+    if not names:
+        return list(expand_matrix(matrix))
+
+    index = get_index(path)
+    selected = sorted(index[name] for name in set(names) if name in index)
+    return [
+        render_case(matrix, number, coordinates)
+        for number, coordinates in selected
+    ]
@@ -0,0 +1,101 @@
+import os
+import re
+from typing import Any, Dict, NamedTuple
+
+from decoder import get_decoder_pix_fmt, get_decoder_video_size
+from scaler import get_input_format, get_output_formats
+from sharding import DEFAULT_FPS, FPS_PATTERN
+from supervisor import FHD_PIXELS, get_max_resolution
+from yuv_compare import get_frame_size
+
+# frame counts of streams generated by the simple encoder aren't known, so
+# estimates assume this number of frames
+ASSUMED_FRAMES = 300
+# encoded streams can exceed the target bitrate (e.g. qp and vbr modes)
+BITRATE_MARGIN = 2.0
+DEFAULT_BITRATE = 5e6
+
+# raw frames which a tool keeps in memory (lookahead, reference frames)
+BUFFERED_FRAMES = 16
+# memory of a tool which doesn't depend on frames
+TOOL_MEMORY = 256 * 1024 ** 2
+# cores used by multithreaded simple tools per FHD stream. ma35 tools
+# offload processing to the device and use one core
+CORES_PER_FHD = 4
+
+BITRATE_PATTERN = re.compile(r'(?:^|\s)-b(?::v)?\s+(\d+(?:\.\d+)?)([KkMG]?)')
+BITRATE_UNITS = {'': 1, 'K': 1e3, 'k': 1e3, 'M': 1e6, 'G': 1e9}
+
+
+def _get_fps(keys: str) -> int:
+    return max([int(x) for x in FPS_PATTERN.findall(keys)], default=DEFAULT_FPS)  # noqa: E501
+
+
+def _get_encoded_bytes(keys: str, frames: int) -> int:
+    """Get size of a stream encoded with keys from its bitrate."""
+    match = BITRATE_PATTERN.search(keys)
+    bitrate = DEFAULT_BITRATE
+    if match:
+        bitrate = float(match.group(1)) * BITRATE_UNITS[match.group(2)]
+    return int(bitrate / 8 * frames / _get_fps(keys) * BITRATE_MARGIN)
+
+
+def estimate_artifact_bytes(args, case: Dict[str, Any]) -> int:
+    """Estimate size of streams which a case writes next to its outputs.
+
+    Inputs of encoders are links to the input cache, so they aren't counted.
+    Returns 0 if the size can't be estimated.
+    """
+    if args.tools != "SimpleSamples":
+        return 0
+
+    if "Encoder" in args.test_group:
+        return 2 * _get_encoded_bytes(case['simple_parameters'], args.input_frames)  # noqa: E501
+    elif "Decoder" in args.test_group:
+        width, height = get_decoder_video_size(case).split('x')
+        frame_size = get_frame_size(int(width), int(height), get_decoder_pix_fmt(case))  # noqa: E501
+        return _get_encoded_bytes(case['prepare'], ASSUMED_FRAMES) + 2 * frame_size * ASSUMED_FRAMES  # noqa: E501
+    elif "Scaler" in args.test_group:
+        input_size = get_frame_size(*get_input_format(case['xma_parameters']))  # noqa: E501
+        output_size = sum(get_frame_size(*x) for x in get_output_formats(case['xma_parameters']))  # noqa: E501
+        return (input_size + 2 * output_size) * ASSUMED_FRAMES
+    elif "Transcoder" in args.test_group:
+        return _get_encoded_bytes(case['prepare'], ASSUMED_FRAMES) + 2 * _get_encoded_bytes(case['simple_parameters'], ASSUMED_FRAMES)  # noqa: E501
+
+    return 0
+
+
+class CaseResources(NamedTuple):
+    # bytes of artifacts on disk
+    disk: int
+    # bytes of memory
+    memory: int
+    # cores
+    cpu: float
+
+
+def _get_tool_memory(keys: str) -> int:
+    # outputs of a tool are buffered separately
+    outputs = max(1, keys.split().count('-o'))
+    return TOOL_MEMORY + BUFFERED_FRAMES * get_max_resolution(keys) * 3 // 2 * outputs  # noqa: E501
+
+
+def _get_tool_cpu(keys: str) -> float:
+    if '--multi-thread' not in keys.split():
+        return 1.0
+    cores = get_max_resolution(keys) / FHD_PIXELS * CORES_PER_FHD
+    return min(float(os.cpu_count() or 1), max(1.0, cores))
+
+
+def estimate_resources(args, case: Dict[str, Any]) -> CaseResources:
+    """Estimate disk, memory and cores which a case needs while it runs.
+
+    Simple and ma35 tools are counted as if they run at the same time.
+    """
+    keys = [case['simple_parameters'], case['xma_parameters']]
+
+    return CaseResources(
+        disk=estimate_artifact_bytes(args, case),
+        memory=sum(_get_tool_memory(x) for x in keys),
+        cpu=_get_tool_cpu(case['simple_parameters']) + 1.0
+    )
@@ -1,13 +1,15 @@
 import os
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 
+from capture import create_fifo
 from encoder import run_tool
+from input_cache import InputCache
 from utils import prepare_keys, select_extension
 
 
 def prepare_decoder_parameters(
     case: Dict[str, Any], *, output_path: str = '',
-    simple_decoder: bool = False
+    simple_decoder: bool = False, fifo: bool = False
 ) -> Tuple[str, str, str]:
 
     input_extension = select_extension(case)
@@ -32,12 +34,42 @@ def prepare_decoder_parameters(
         )
         case["prepared_keys_xma"] = prepared_keys
 
+    # raw output is hashed while the decoder writes it into a named pipe
+    if fifo:
+        create_fifo(output_stream)
+
     return prepared_keys, input_stream, output_stream
 
 
+def get_decoder_video_size(case: Dict[str, Any]) -> str:
+    keys_list = case['prepare'].split()
+    video_size = keys_list[1]
+
+    if 'x' not in video_size:
+        video_size = keys_list[keys_list.index('--size')+1]
+
+    return video_size
+
+
+def get_decoder_pix_fmt(case: Dict[str, Any]) -> str:
+    keys_list = case['xma_parameters'].split()
+
+    if '-pix_fmt' in keys_list:
+        return keys_list[keys_list.index('-pix_fmt')+1]
+
+    return 'yuv420p'
+
+
 def prepare_decoder_input(
-    case: Dict[str, Any], encoder: str, output_stream: str, log: str
+    case: Dict[str, Any], encoder: str, output_stream: str, log: str,
+    error_messages: set, *, cache: Optional[InputCache] = None,
+    timeout: Optional[float] = None
 ) -> None:
-    encoder_keys = prepare_keys(case['prepare'], '', output_stream)
+    def _encode(stream: str) -> None:
+        encoder_keys = prepare_keys(case['prepare'], '', stream)
+        run_tool(encoder, encoder_keys, log, error_messages, timeout=timeout)
 
-    run_tool(encoder, encoder_keys, log)
+    if cache:
+        cache.prepare(encoder, case['prepare'], output_stream, _encode, log)
+    else:
+        _encode(output_stream)
@@ -1,41 +1,122 @@
+import asyncio
 import os
-from subprocess import Popen
-from typing import Any, Dict, Tuple
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-from exceptions import ToolFailedException
+from capture import FifoCapture
+import yuv_pattern
+from exceptions import ToolFailedException, ToolTimeoutException
+from input_cache import InputCache
+from metrics import TOOL_DURATION
+from supervisor import supervise
+from tracer import add_span
 from utils import prepare_keys, select_extension
+from yuv_pattern import generate_pattern, get_pattern_key
 from jobs_launcher.core.config import main_logger
 
 
-def run_tool(tool: str, params: str, log: str, error_messages: set):
-    tool_name = tool.split('/')[-1]
+class ToolRun(NamedTuple):
+    tool: str
+    params: str
+    log: str
+    # outputs which are written into named pipes and hashed on the fly
+    captures: Optional[List[str]] = None
+    timeout: Optional[float] = None
+    # resources used by the tool are written here
+    usage: Optional[Dict[str, Any]] = None
+    # captured outputs are also written to files (see FifoCapture)
+    spill: bool = False
+
+
+async def _run_tool(run: ToolRun, error_messages: set,
+                    track: str = "") -> List[FifoCapture]:
+    tool_name = run.tool.split('/')[-1]
+
+    fifo_captures = [FifoCapture(path, run.spill) for path in run.captures or []]  # noqa: E501
+    for capture in fifo_captures:
+        capture.start()
 
     # run complex ffmpeg commands with filters
     if tool_name == 'ffmpeg':
         shell = True
-        command = f"{tool} {params}"
+        command = f"{run.tool} {run.params}"
     else:
         shell = False
-        command = [tool] + params.split()
+        command = [run.tool] + run.params.split()
+
+    start_time = time.perf_counter()
+    try:
+        exit_code = await supervise(command, run.log, shell=shell,
+                                    timeout=run.timeout, usage=run.usage)
+    except asyncio.TimeoutError:
+        message = f"{tool_name} exceeded timeout ({run.timeout:.1f} s) processing prams '{run.params}'"  # noqa: E501
+        main_logger.error(message)
+        error_messages.add(message)
+        raise ToolTimeoutException(message)
+    finally:
+        end_time = time.perf_counter()
+        TOOL_DURATION.observe(end_time - start_time, tool=tool_name)
+        add_span(tool_name, start_time, end_time, "run_tool", track,
+                 params=run.params)
+        loop = asyncio.get_running_loop()
+        for capture in fifo_captures:
+            await loop.run_in_executor(None, capture.finish)
+
+    # check simple tools and ama tools for non-zero exit codes
+    if tool_name not in ('ffprobe') and exit_code != 0:
+        message = f"{tool_name} returned non-zero exit code processing prams '{run.params}'"  # noqa: E501
+        main_logger.error(message)
+        error_messages.add(message)
+        raise ToolFailedException(message)
+
+    return fifo_captures
+
+
+async def _run_tools(runs: List[ToolRun],
+                     error_messages: set) -> List[List[FifoCapture]]:
+    # tools which run at the same time are traced on separate tracks
+    tasks = [
+        asyncio.ensure_future(_run_tool(run, error_messages, track=run.tool.split('/')[-1]))  # noqa: E501
+        for run in runs
+    ]
+
+    try:
+        return await asyncio.gather(*tasks)
+    except Exception:
+        # results of other tools are useless if one of them failed
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def run_tool(tool: str, params: str, log: str, error_messages: set,
+             captures: Optional[List[str]] = None,
+             timeout: Optional[float] = None,
+             usage: Optional[Dict[str, Any]] = None,
+             spill: bool = False) -> List[FifoCapture]:
+    return asyncio.run(_run_tool(
+        ToolRun(tool, params, log, captures, timeout, usage, spill),
+        error_messages
+    ))
+
 
-    with open(log, 'w+') as file:
-        process = Popen(command, stderr=file.fileno(), stdout=file.fileno(), shell=shell)
-        exit_code = process.wait()  # noqa: E501
-        # check simple tools and ama tools for non-zero exit codes
-        if tool_name not in ('ffprobe') and exit_code != 0:
-            message = f"{tool_name} returned non-zero exit code processing prams '{params}'"  # noqa: E501
-            main_logger.error(message)
-            error_messages.add(message)
-            raise ToolFailedException(message)
+def run_tools(runs: List[ToolRun],
+              error_messages: set) -> List[List[FifoCapture]]:
+    """Run independent tools at the same time from one event loop.
+
+    If one of tools fails, others are cancelled.
+    """
+    return asyncio.run(_run_tools(runs, error_messages))
 
 
 def prepare_encoder_parameters(
-    case: Dict[str, Any], *, output_path: str = '',
+    case: Dict[str, Any], *, output_path: str = '', input_path: str = '',
     simple_encoder: bool = False
 ) -> Tuple[str, str, str]:
     output_extension = select_extension(case)
     input_stream = os.path.relpath(
-        os.path.join(output_path, f"{case['case']}.yuv")
+        os.path.join(input_path or output_path, f"{case['case']}.yuv")
     )
 
     if simple_encoder:
@@ -43,9 +124,12 @@ def prepare_encoder_parameters(
             os.path.join(output_path, f"{case['case']}.{output_extension}")
         )
 
-        prepared_keys = prepare_keys(
-            case["simple_parameters"], input_stream, output_stream
+        # input is generated beforehand, so both encoders read the same
+        # stream and don't wait for each other
+        simple_keys = " ".join(
+            x for x in case["simple_parameters"].split() if x != "--dump-input"  # noqa: E501
         )
+        prepared_keys = prepare_keys(simple_keys, input_stream, output_stream)
         case["prepared_keys_simple"] = prepared_keys
     else:
         output_stream = os.path.relpath(
@@ -58,3 +142,36 @@ def prepare_encoder_parameters(
         case["prepared_keys_xma"] = prepared_keys
 
     return prepared_keys, input_stream, output_stream
+
+
+def get_encoder_input_format(case: Dict[str, Any]) -> Tuple[int, int, str]:
+    keys_list = case['xma_parameters'].split()
+
+    width = int(keys_list[keys_list.index('-w')+1])
+    height = int(keys_list[keys_list.index('-h')+1])
+    pix_fmt = 'yuv420p'
+    if '-pix_fmt' in keys_list:
+        pix_fmt = keys_list[keys_list.index('-pix_fmt')+1]
+
+    return width, height, pix_fmt
+
+
+def prepare_encoder_input(
+    case: Dict[str, Any], output_stream: str, *,
+    frames: int = yuv_pattern.DEFAULT_FRAMES,
+    pattern: str = yuv_pattern.DEFAULT_PATTERN,
+    cache: Optional[InputCache] = None
+) -> None:
+    width, height, pix_fmt = get_encoder_input_format(case)
+
+    def _generate(stream: str) -> None:
+        generate_pattern(stream, width, height, pix_fmt, frames, pattern)
+
+    # inputs of all cases with the same format are taken from one entry.
+    # Entries are invalidated by changes of the generator
+    if cache:
+        cache.prepare(yuv_pattern.__file__,
+                      get_pattern_key(width, height, pix_fmt, frames, pattern),  # noqa: E501
+                      output_stream, _generate)
+    else:
+        _generate(output_stream)
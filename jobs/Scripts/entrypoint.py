@@ -8,7 +8,8 @@ ROOT_PATH = os.path.abspath(
 )
 sys.path.append(ROOT_PATH)
 
-from run_tests import run_tests  # noqa: E402
+from run_tests import run_groups, run_tests  # noqa: E402
+from utils import get_manifest_arguments  # noqa: E402
 
 
 def createArgsParser():
@@ -17,12 +18,107 @@ def createArgsParser():
     parser.add_argument("--output", required=True, metavar="<dir>")
     parser.add_argument("--tool_path", required=True, metavar="<dir>")
     parser.add_argument("--retries", required=False, default=2, type=int)
-    parser.add_argument("--test_group", required=True)
+    # several groups are run by one process. Results of each group are saved
+    # to its subdirectory of output
+    parser.add_argument("--test_group", required=True, nargs="+")
+    # number of groups which run at the same time
+    parser.add_argument("--parallel_groups", required=False, default=1, type=int)  # noqa: E501
     parser.add_argument("--test_cases", required=True)
     parser.add_argument("--tools", required=True)
+    parser.add_argument("--jobs", required=False, default=1, type=int)
+    parser.add_argument("--fifo_outputs", required=False, action="store_true")
+    # captured outputs are also written to files, so tools don't run again
+    # if they differ. Outputs of passed cases are written to disk too
+    parser.add_argument("--fifo_spill", required=False, action="store_true")
+    parser.add_argument("--input_cache", required=False, default="")
+    # file with results of previous runs to skip unchanged passed cases
+    parser.add_argument("--incremental", required=False, default="")
+    # timeout of a tool which processes one FHD stream, scaled by resolution
+    # and number of outputs of the tool. 0 disables timeouts of tools
+    parser.add_argument("--tool_timeout", required=False, default=600, type=float)  # noqa: E501
+    # timeout of one try of a case. 0 disables it
+    parser.add_argument("--case_timeout", required=False, default=0, type=float)  # noqa: E501
+    # run simple and ma35 tools at the same time if they are independent
+    parser.add_argument("--concurrent_tools", required=False, action="store_true")  # noqa: E501
+    # how deep ffprobe analyzes mismatching outputs
+    parser.add_argument("--probe_depth", required=False, default="full",
+                        choices=["header", "packets", "full"])
+    # record statuses of cases to the journal instead of test_cases.json
+    parser.add_argument("--journal", required=False, action="store_true")
+    # skip cases which were finished according to the journal
+    parser.add_argument("--resume", required=False, action="store_true")
+    # number of measured runs of ffmpeg builds. 0 measures the single run
+    # which produces compared outputs
+    parser.add_argument("--ffmpeg_bench_runs", required=False, default=0, type=int)  # noqa: E501
+    # number of discarded runs before measured ones
+    parser.add_argument("--ffmpeg_bench_warmup", required=False, default=1, type=int)  # noqa: E501
+    # keep only this number of the first and the last lines of tool logs
+    # (and lines with errors). 0 in both keeps whole logs
+    parser.add_argument("--log_head_lines", required=False, default=0, type=int)  # noqa: E501
+    parser.add_argument("--log_tail_lines", required=False, default=0, type=int)  # noqa: E501
+    # save html logs compressed with gzip
+    parser.add_argument("--compress_logs", required=False, action="store_true")  # noqa: E501
+    # run only a part of selected cases ('i/N', 1 <= i <= N). Cases are
+    # distributed between shards by their cost
+    parser.add_argument("--shard", required=False, default="")
+    # report_compare.json or results directory of a previous run with
+    # execution time of cases
+    parser.add_argument("--shard_history", required=False, default="")
+    # SQLite database with durations of cases of previous runs. It's used
+    # to order cases longest-first and to predict timeouts of cases
+    parser.add_argument("--timing_db", required=False, default="")
+    # predicted timeout of a try of a case is p99 of durations of its tries
+    # times this factor
+    parser.add_argument("--timeout_factor", required=False, default=3.0, type=float)  # noqa: E501
+    # time budget of the group from its manifest
+    parser.add_argument("--group_budget", required=False, default=3600, type=float)  # noqa: E501
+    # inputs of encoders are generated with this number of frames and pattern
+    parser.add_argument("--input_frames", required=False, default=60, type=int)  # noqa: E501
+    parser.add_argument("--input_pattern", required=False, default="gradient",
+                        choices=["gradient", "bars", "noise"])
+    # fast storage (e.g. /dev/shm) for artifacts of running cases and its
+    # budget in GB. 0 means half of its free space
+    parser.add_argument("--scratch", required=False, default="")
+    parser.add_argument("--scratch_size", required=False, default=0, type=float)  # noqa: E501
+    # cases are started only while their estimated disk, memory and cores
+    # fit into free resources of the machine. Reserves are left free (GB)
+    parser.add_argument("--admission_control", required=False, action="store_true")  # noqa: E501
+    parser.add_argument("--disk_reserve", required=False, default=5.0, type=float)  # noqa: E501
+    parser.add_argument("--memory_reserve", required=False, default=2.0, type=float)  # noqa: E501
+    # OpenMetrics of the run are served over HTTP at this port and/or
+    # written to the textfile of node_exporter
+    parser.add_argument("--metrics_port", required=False, default=0, type=int)  # noqa: E501
+    parser.add_argument("--metrics_address", required=False, default="127.0.0.1")  # noqa: E501
+    parser.add_argument("--metrics_textfile", required=False, default="")
+    # spans of cases and their phases are written to this file in Chrome
+    # trace event format (can be opened in Perfetto)
+    parser.add_argument("--trace", required=False, default="")
+    # detected platform and render device are cached in this file (per user
+    # in temp dir by default) and reused for this number of seconds. 0 disables
+    # the cache. Failed detection of the render device isn't cached
+    parser.add_argument("--system_info_cache", required=False, default="")
+    parser.add_argument("--system_info_ttl", required=False, default=86400, type=float)  # noqa: E501
+    # max size of the input cache in GB
+    parser.add_argument("--input_cache_size", required=False, default=50.0, type=float)  # noqa: E501
 
     return parser
 
 
+def parse_group_args(test_group: str):
+    # options from the job manifest of the group override common ones
+    args = createArgsParser().parse_args(
+        sys.argv[1:] + get_manifest_arguments(test_group)
+    )
+    args.test_group = test_group
+    args.output = os.path.join(args.output, test_group)
+    return args
+
+
 args = createArgsParser().parse_args()
-run_tests(args)
+if len(args.test_group) == 1:
+    args.test_group = args.test_group[0]
+    run_tests(args)
+else:
+    exit(run_groups(
+        [parse_group_args(x) for x in args.test_group], args.parallel_groups
+    ))
@@ -1,2 +1,6 @@
 class ToolFailedException(Exception):
     ...
+
+
+class ToolTimeoutException(ToolFailedException):
+    ...
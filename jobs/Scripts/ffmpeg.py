@@ -1,9 +1,19 @@
 import os
-from typing import Any, Dict, Tuple
+import re
+from typing import Any, Dict, List, Optional, Tuple
 
+from bench_stats import parity_verdict, summarize
+from encoder import run_tool
 from utils import prepare_keys
 from jobs_launcher.core.config import main_logger
 
+# matches both progress (fps=29.50) and stats (fps= 29) lines
+FPS_PATTERN = re.compile(r'\bfps=\s*([0-9]+(?:\.[0-9]+)?)')
+# progress is written to stdout, which goes to the log of a tool
+PROGRESS_KEYS = '-progress pipe:1 -nostats'
+# allowed relative difference of AMF and MA35 ffmpeg throughput
+PARITY_TOLERANCE = 0.03
+
 
 def select_input_file(case: Dict[str, Any]):
     # map videos to ffmpeg usecases
@@ -50,26 +60,105 @@ def prepare_ffmpeg_parameters(
     return prepared_keys, input_stream, output_stream
 
 
+def read_fps_series(log: str) -> List[float]:
+    """Get all fps values reported by ffmpeg in order of appearance."""
+    series = []
+
+    with open(log, 'r', encoding='utf-8', errors='replace') as file:
+        for line in file:
+            series.extend(float(x) for x in FPS_PATTERN.findall(line))
+
+    return series
+
+
 def measure_ffmpeg_performance(
     amf_log: str, xma_log: str, *, error_messages: set
-):
-
-    def _get_last_fps_entry_from_log(log: str):
-        result = 0
-        with open(log, 'r', encoding='utf-8') as file:
-            content = file.readlines()
+) -> Dict[str, Any]:
 
-        for line in content[::-1]:
-            if 'fps=' in line:
-                result = int(line.split('fps=')[1].split(' ')[0])
-                return result
+    def _get_last_fps_entry_from_log(log: str) -> float:
+        series = read_fps_series(log)
+        if series:
+            return series[-1]
 
         error_messages.add(f"Couldn't find 'fps=' information from {log}, set value to 0")
-        return result
+        return 0.0
 
     amf_avg_fps = _get_last_fps_entry_from_log(amf_log)
     xma_avg_fps = _get_last_fps_entry_from_log(xma_log)
 
-    if amf_avg_fps < (xma_avg_fps + (xma_avg_fps * 3 / 100)) or amf_avg_fps > (xma_avg_fps + (xma_avg_fps * 3 / 100)):
-        message = f"AMF_FFMPEG's performace (fps={amf_avg_fps}) difference with VPI_FFMPG's performance (fps={xma_avg_fps}) is more than 3%"
-        error_messages.add(message)
+    performance = {
+        'amf': summarize([amf_avg_fps]), 'ma35': summarize([xma_avg_fps])
+    }
+
+    if xma_avg_fps:
+        performance['parity'] = parity_verdict(
+            [amf_avg_fps], [xma_avg_fps], PARITY_TOLERANCE
+        )
+        if performance['parity']['verdict'] == 'different':
+            message = f"AMF_FFMPEG's performace (fps={amf_avg_fps}) difference with VPI_FFMPG's performance (fps={xma_avg_fps}) is more than 3%"
+            error_messages.add(message)
+
+    return performance
+
+
+def benchmark_ffmpeg(
+    runs: Dict[str, Tuple[str, str, str, Optional[float]]], *,
+    repetitions: int, warmup: int, error_messages: set
+) -> Dict[str, Any]:
+    """Measure throughput of AMF and MA35 ffmpeg builds over several runs.
+
+    Runs of the builds alternate, so drift of the machine state affects both
+    of them. Warmup runs are discarded.
+
+    Args:
+        runs (Dict[str, Tuple[str, str, str, Optional[float]]]): 'amf' and
+            'ma35' mapped to tool, prepared keys, log and timeout
+        repetitions (int): Number of measured runs of each build
+        warmup (int): Number of discarded runs of each build
+
+    Returns:
+        Dict[str, Any]: Statistics of average fps of runs of each build,
+            fps series of the last run and parity verdict
+    """
+    samples = {name: [] for name in runs}
+    performance = {}
+
+    for index in range(warmup + repetitions):
+        for name, (tool, keys, log, timeout) in runs.items():
+            run_tool(tool, f"{PROGRESS_KEYS} {keys}", log, error_messages,
+                     timeout=timeout)
+            series = read_fps_series(log)
+
+            if not series:
+                error_messages.add(f"Couldn't find 'fps=' information from {log}")  # noqa: E501
+                continue
+
+            if index >= warmup:
+                # the last progress entry holds the average of the whole run
+                samples[name].append(series[-1])
+                performance[name] = {'series': series}
+
+    for name, values in samples.items():
+        performance.setdefault(name, {}).update(summarize(values))
+
+    if samples['amf'] and samples['ma35'] and any(samples['ma35']):
+        parity = parity_verdict(samples['amf'], samples['ma35'], PARITY_TOLERANCE)  # noqa: E501
+        performance['parity'] = parity
+
+        main_logger.info(
+            f"AMF fps: {performance['amf']['mean']:.2f}, MA35 fps: {performance['ma35']['mean']:.2f}, "  # noqa: E501
+            f"verdict: {parity['verdict']}"
+        )
+
+        if parity['verdict'] == 'different':
+            message = (
+                f"AMF_FFMPEG's mean fps ({performance['amf']['mean']:.2f}) differs from "  # noqa: E501
+                f"VPI_FFMPG's mean fps ({performance['ma35']['mean']:.2f}) by "
+                f"{parity['relative_difference']:.1%} which is more than {PARITY_TOLERANCE:.0%}"  # noqa: E501
+            )
+            # one run isn't enough to build the interval
+            if parity['ci_low'] is not None:
+                message += f" (95% CI: {parity['ci_low']:.1%}..{parity['ci_high']:.1%})"  # noqa: E501
+            error_messages.add(message)
+
+    return performance
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import bitstream
+import process_results
+import yuv_compare
+import yuv_pattern
+from ffmpeg import select_input_file
+from utils import get_file_hash
+
+# modules of the harness which generate inputs and compare outputs
+HARNESS_MODULES = (yuv_pattern, process_results, yuv_compare, bitstream)
+
+
+def fingerprint_case(args, case: Dict[str, Any], tools: Dict[str, str]) -> str:
+    """Get fingerprint of everything which affects results of a case.
+
+    Keys are taken before placeholders are replaced, because prepared keys
+    contain paths which depend on the output directory of the run.
+    """
+    fingerprint = {
+        'test_group': args.test_group,
+        'case': case['case'],
+        'simple_parameters': case['simple_parameters'],
+        'xma_parameters': case['xma_parameters'],
+        # input streams of decoder and transcoder are prepared by encoder,
+        # so they are covered by prepare keys and hash of the encoder
+        'prepare': case.get('prepare', ''),
+        'tools': {
+            name: get_file_hash(path) for name, path in sorted(tools.items())
+        },
+        # results stay valid only while the harness checks them the same way
+        'harness': {
+            module.__name__: get_file_hash(module.__file__)
+            for module in HARNESS_MODULES
+        }
+    }
+
+    if args.tools == "SimpleSamples" and "Encoder" in args.test_group:
+        # inputs of encoders are generated
+        fingerprint['input'] = [args.input_frames, args.input_pattern]
+
+    if args.tools == "FFMPEG":
+        input_stream = os.path.join(args.tool_path, select_input_file(case))
+        fingerprint['input'] = get_file_hash(input_stream)
+
+    return hashlib.sha256(
+        json.dumps(fingerprint, sort_keys=True).encode()
+    ).hexdigest()
+
+
+class ResultStore:
+    """Passed results of previous runs stored by fingerprints of cases.
+
+    Results are appended to a JSON lines file, the last record of a
+    fingerprint wins. The file is compacted when it is loaded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._results: Dict[str, Dict[str, Any]] = {}
+
+        records = 0
+        damaged = False
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # the last line is incomplete if a run was killed
+                        damaged = True
+                        continue
+                    self._results[record['fingerprint']] = record
+                    records += 1
+
+        if damaged or records > len(self._results):
+            self._compact()
+
+    def _compact(self) -> None:
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as file:
+            for record in self._results.values():
+                file.write(json.dumps(record) + '\n')
+        os.replace(temp_path, self.path)
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._results.get(fingerprint)
+
+    def put(self, fingerprint: str, case: Dict[str, Any],
+            execution_time: float) -> None:
+        record = {
+            'fingerprint': fingerprint,
+            'case': case['case'],
+            'execution_time': execution_time,
+            'prepared_keys_simple': case['prepared_keys_simple'],
+            'prepared_keys_xma': case['prepared_keys_xma'],
+            'compare_results': case.get('compare_results', []),
+            'date_time': datetime.now().strftime('%m/%d/%Y %H:%M:%S')
+        }
+
+        with self._lock:
+            self._results[fingerprint] = record
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a') as file:
+                file.write(json.dumps(record) + '\n')
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Dict, Set
+
+from utils import get_file_hash
+
+from jobs_launcher.core.config import main_logger
+
+# ioctl which makes a copy-on-write clone of a file (btrfs, xfs)
+FICLONE = 0x40049409
+
+
+def link_file(source: str, destination: str) -> None:
+    """Make destination refer to the content of source without copying it.
+
+    Hard link is tried first, then reflink. The file is copied only if the
+    file system supports neither of them.
+    """
+    if os.path.lexists(destination):
+        os.remove(destination)
+
+    try:
+        os.link(source, destination)
+        return
+    except OSError:
+        pass
+
+    try:
+        import fcntl
+        with open(source, 'rb') as src, open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return
+    except (ImportError, OSError):
+        pass
+
+    shutil.copyfile(source, destination)
+
+
+class InputCache:
+    """Persistent storage of prepared input streams.
+
+    Streams are addressed by the hash of the encoder binary and the keys
+    which were used to prepare them. Each stream has a metadata file with
+    its size and sha256, which is used to check it before the first use.
+    Least recently used streams are removed when the total size of the
+    cache exceeds max_size.
+    """
+
+    def __init__(self, root: str, max_size: int):
+        self.root = root
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._verified: Set[str] = set()
+        # entries which are checked or linked now aren't evicted
+        self._in_use: Dict[str, int] = {}
+        self._evict_lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+
+    def _get_key(self, encoder: str, keys: str, extension: str) -> str:
+        key = hashlib.sha256()
+        key.update(get_file_hash(encoder).encode())
+        key.update(keys.encode())
+        key.update(extension.encode())
+        return key.hexdigest()
+
+    def _get_key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _use(self, entry: str, count: int) -> None:
+        with self._lock:
+            self._in_use[entry] = self._in_use.get(entry, 0) + count
+            if not self._in_use[entry]:
+                del self._in_use[entry]
+
+    def _is_valid(self, key: str, entry: str, meta_path: str) -> bool:
+        try:
+            with open(meta_path, 'r') as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if not os.path.exists(entry) or os.path.getsize(entry) != meta['size']:  # noqa: E501
+            return False
+
+        # full check is done once per run, entries are immutable after that
+        if key not in self._verified:
+            if get_file_hash(entry, algorithm='sha256') != meta['sha256']:
+                return False
+            self._verified.add(key)
+
+        return True
+
+    def prepare(self, encoder: str, keys: str, output_stream: str,
+                create: Callable[[str], None], log: str = '') -> None:
+        """Put the stream prepared with keys to output_stream.
+
+        Args:
+            encoder (str): Path to the encoder which prepares streams
+            keys (str): Keys of the encoder with '\\<output_stream\\>'
+                placeholder
+            output_stream (str): Path where the stream is expected
+            create (Callable[[str], None]): Function which prepares the
+                stream at the given path if it isn't cached yet
+            log (str, optional): Log of input preparation. Cache hits are
+                recorded there instead of the encoder output
+        """
+        extension = os.path.splitext(output_stream)[1]
+        key = self._get_key(encoder, keys, extension)
+        entry = os.path.join(self.root, key[:2], key + extension)
+        meta_path = os.path.join(self.root, key[:2], key + '.json')
+
+        with self._get_key_lock(key):
+            self._use(entry, 1)
+            try:
+                self._prepare_entry(key, entry, meta_path, keys, encoder,
+                                    create, log)
+                link_file(entry, output_stream)
+            finally:
+                self._use(entry, -1)
+
+    def _prepare_entry(self, key: str, entry: str, meta_path: str, keys: str,
+                       encoder: str, create: Callable[[str], None],
+                       log: str) -> None:
+        if self._is_valid(key, entry, meta_path):
+            main_logger.info(f"Use cached input {entry}")
+            # update access time for LRU eviction
+            os.utime(entry)
+            if log:
+                with open(log, 'w') as file:
+                    file.write(f"Input stream is taken from cache: {entry}\n")  # noqa: E501
+        else:
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            # other processes can use the same cache
+            temp_entry = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"  # noqa: E501
+            create(temp_entry)
+
+            meta = {
+                'size': os.path.getsize(temp_entry),
+                'sha256': get_file_hash(temp_entry, algorithm='sha256'),
+                'keys': keys,
+                'encoder': encoder,
+                'created': time.time()
+            }
+            os.replace(temp_entry, entry)
+            with open(meta_path, 'w') as file:
+                json.dump(meta, file)
+            self._verified.add(key)
+
+            self.evict(keep=entry)
+
+    def evict(self, keep: str = '') -> None:
+        """Remove least recently used entries until the cache fits max_size.
+
+        Entries which are being checked or linked by other threads are kept.
+        """
+        with self._evict_lock:
+            self._evict(keep)
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        total_size = 0
+
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith('.json') or name.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    # removed by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if path == keep:
+                continue
+
+            # entries are marked as used under the same lock, so an entry
+            # can't be removed between its check and its link
+            with self._lock:
+                if path in self._in_use:
+                    continue
+                main_logger.info(f"Remove cached input {path}")
+                meta_path = os.path.splitext(path)[0] + '.json'
+                for file_path in (path, meta_path):
+                    try:
+                        os.remove(file_path)
+                    except FileNotFoundError:
+                        pass
+            total_size -= size
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+# statuses after which a case isn't executed again when a run is resumed
+FINAL_STATUSES = ('passed', 'failed', 'observed')
+
+# records are flushed to disk in batches
+FSYNC_BATCH = 16
+# test_cases.json is rebuilt after this number of records
+CHECKPOINT_INTERVAL = 50
+
+
+def read_journal(path: str) -> Dict[str, str]:
+    """Get the last recorded status of each case."""
+    statuses = {}
+
+    if not os.path.exists(path):
+        return statuses
+
+    with open(path, 'r') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the last record is incomplete if a run was killed
+                continue
+            statuses[record['case']] = record['status']
+
+    return statuses
+
+
+class CaseJournal:
+    """Append-only log of status changes of cases.
+
+    It replaces rewriting of the whole test_cases.json after each try.
+    test_cases.json is rebuilt only at checkpoints and when the journal is
+    closed, while the journal lets an interrupted run be resumed.
+    """
+
+    def __init__(self, path: str, test_cases_path: str, resume: bool = False):
+        self.path = path
+        self.test_cases_path = test_cases_path
+        self._file = open(path, 'a' if resume else 'w')
+        self._unsynced = 0
+        self._records = 0
+
+    def record(self, case: Dict[str, Any], cases: List[Dict[str, Any]]) -> None:  # noqa: E501
+        # must be called under the lock which protects cases. Running cases
+        # mustn't be changed while they are written
+        self._file.write(json.dumps(
+            {'case': case['case'], 'status': case['status'], 'time': time.time()},  # noqa: E501
+            separators=(',', ':')
+        ) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        self._records += 1
+
+        if self._unsynced >= FSYNC_BATCH:
+            self._sync()
+
+        if self._records % CHECKPOINT_INTERVAL == 0:
+            self.checkpoint(cases)
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def checkpoint(self, cases: List[Dict[str, Any]]) -> None:
+        temp_path = f"{self.test_cases_path}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(cases, file, indent=4)
+        os.replace(temp_path, self.test_cases_path)
+
+    def close(self, cases: List[Dict[str, Any]]) -> None:
+        self._sync()
+        self._file.close()
+        self.checkpoint(cases)
@@ -0,0 +1,148 @@
+import gzip
+import html
+import os
+import re
+import threading
+import uuid
+from collections import deque
+from contextlib import suppress
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Iterable, Optional
+
+from jobs_launcher.core.config import main_logger
+
+HTML_HEADER = "<!DOCTYPE html><html><body><span style=\"white-space: pre-line; font-family:'Courier New'\">\n"  # noqa: E501
+HTML_FOOTER = "</span></body></html>"
+
+COPY_CHUNK_SIZE = 1024 * 1024
+# longer lines are split, so a window never holds more than this per line
+MAX_LINE_LENGTH = 64 * 1024
+
+# lines which are kept even if they're out of head and tail windows
+ERROR_PATTERN = re.compile(r'error|fail|fatal|abort|exception', re.IGNORECASE)  # noqa: E501
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _open_destination(path: str, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+    return open(path, 'w', encoding='utf-8')
+
+
+def _write_skipped(destination: IO[str], skipped: int) -> None:
+    if skipped:
+        destination.write(f"\n... {skipped} lines skipped ...\n\n")
+
+
+def convert_log(log: str, destination_path: str, *, head_lines: int = 0,
+                tail_lines: int = 0) -> None:
+    """Convert a tool log to HTML page without loading it into memory.
+
+    Args:
+        log (str): Path to the log
+        destination_path (str): Path to the page. It's compressed with gzip
+            if the path ends with '.gz'
+        head_lines (int, optional): Number of the first lines to keep
+        tail_lines (int, optional): Number of the last lines to keep. If
+            both windows are 0, the whole log is kept. Otherwise lines out
+            of windows are kept only if they mention errors
+    """
+    temp_path = f"{destination_path}.tmp"
+
+    with open(log, 'r', encoding='utf-8', errors='replace') as source, \
+            _open_destination(temp_path, destination_path.endswith('.gz')) as destination:  # noqa: E501
+        destination.write(HTML_HEADER)
+
+        if not head_lines and not tail_lines:
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                destination.write(html.escape(chunk, quote=False))
+        else:
+            number = 0
+            skipped = 0
+            tail = deque()
+
+            while True:
+                line = source.readline(MAX_LINE_LENGTH)
+                if not line:
+                    break
+                number += 1
+
+                if number <= head_lines:
+                    destination.write(html.escape(line, quote=False))
+                    continue
+
+                tail.append((number, line))
+                if len(tail) <= tail_lines:
+                    continue
+
+                # a line leaves the tail window, so only errors are kept
+                old_number, old_line = tail.popleft()
+                if ERROR_PATTERN.search(old_line):
+                    _write_skipped(destination, skipped)
+                    skipped = 0
+                    destination.write(html.escape(f"[line {old_number}] {old_line}", quote=False))  # noqa: E501
+                else:
+                    skipped += 1
+
+            _write_skipped(destination, skipped)
+            for _, line in tail:
+                destination.write(html.escape(line, quote=False))
+
+        destination.write(HTML_FOOTER)
+
+    os.replace(temp_path, destination_path)
+
+
+def _convert_pending(pending: str, log: str, destination_path: str,
+                     head_lines: int, tail_lines: int) -> None:
+    try:
+        convert_log(pending, destination_path, head_lines=head_lines,
+                    tail_lines=tail_lines)
+        main_logger.info("Finish logs saving")
+    except Exception as e:
+        main_logger.error(f"Failed during logs saving. Exception: {str(e)}")
+    finally:
+        # the log is put back unless the next try of the case wrote it again
+        with suppress(OSError):
+            os.link(pending, log)
+        with suppress(OSError):
+            os.remove(pending)
+
+
+def submit_log(log: str, destination_path: str, *, head_lines: int = 0,
+               tail_lines: int = 0) -> Future:
+    """Convert a log on a background thread.
+
+    The log is renamed first, so the next try of the case can write a new
+    log while the previous one is converted.
+
+    Returns:
+        Future: Conversion of the log. Test groups which run in one process
+            wait only for their own logs
+    """
+    global _EXECUTOR
+
+    pending = f"{log}.{uuid.uuid4().hex}.pending"
+    os.replace(log, pending)
+
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            # logs are converted in order of submission, so the page of the
+            # last try of a case is written last
+            _EXECUTOR = ThreadPoolExecutor(max_workers=1,
+                                           thread_name_prefix="logs")
+        return _EXECUTOR.submit(
+            _convert_pending, pending, log, destination_path, head_lines,
+            tail_lines
+        )
+
+
+def wait_for_logs(pending: Iterable[Future]) -> None:
+    """Wait until the submitted logs are converted."""
+    for future in pending:
+        future.result()
@@ -1,27 +1,57 @@
 import argparse
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--work_dir', required=True)
-    args = parser.parse_args()
-    work_dir = args.work_dir
+from report_aggregator import SUMMARY_NAME, summarize_reports, write_summary
+
+# the same as CASE_REPORT_SUFFIX of jobs_launcher. The script is run
+# without jobs_launcher in its path
+CASE_REPORT_SUFFIX = '_RPR.json'
+
+# reading of small reports is bound by latency of the file system
+READ_WORKERS = 16
+
+
+def read_report(path: str) -> Dict[str, Any]:
+    with open(path, 'r') as file:
+        report = json.load(file)[0]
+
+    if report.get('group_timeout_exceeded', False):
+        report['message'].append('Test group timeout exceeded')
 
-    json_files = list(
-        filter(
-            lambda x: x.endswith('RPR.json'), os.listdir(work_dir)
-        )
-    )
+    return report
 
-    reports = []
 
-    for file in json_files:
-        json_content = json.load(open(os.path.join(work_dir, file), 'r'))[0]
+def list_reports(work_dirs: List[str]) -> List[str]:
+    """Get paths of reports of cases in results of a group or of its shards."""
+    return [
+        os.path.join(work_dir, name)
+        for work_dir in work_dirs for name in os.listdir(work_dir)
+        if name.endswith(CASE_REPORT_SUFFIX)
+    ]
 
-        if json_content.get('group_timeout_exceeded', False):
-            json_content['message'].append('Test group timeout exceeded')
 
-        reports.append(json_content)
-    with open(os.path.join(work_dir, 'report_compare.json'), 'w') as f:
+def collect_reports(work_dirs: List[str]) -> List[Dict[str, Any]]:
+    """Read reports of cases from results of a group or of its shards."""
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as executor:
+        return list(executor.map(read_report, list_reports(work_dirs)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    # several directories are merged (e.g. results of shards of a group)
+    parser.add_argument('--work_dir', required=True, nargs='+')
+    # the first work_dir by default
+    parser.add_argument('--output', required=False, default='')
+    args = parser.parse_args()
+    output = args.output or args.work_dir[0]
+
+    reports = collect_reports(args.work_dir)
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, 'report_compare.json'), 'w') as f:
         json.dump(reports, f, indent=4)
+
+    write_summary(os.path.join(output, SUMMARY_NAME), summarize_reports(reports))  # noqa: E501
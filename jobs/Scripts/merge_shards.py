@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import shutil
+from typing import Any, Dict, List
+
+from make_compare_report import list_reports
+
+# subdirectories of results of a shard which are merged file by file
+MERGED_DIRS = ("tool_logs", "Color")
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    # results are often merged on the same file system, so hard links
+    # avoid copying of heavy artifacts
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def merge_shards(shard_dirs: List[str], output: str) -> None:
+    """Combine results of shards of a test group into one directory.
+
+    The merged directory can be passed to make_compare_report.py.
+    """
+    os.makedirs(output, exist_ok=True)
+    for directory in MERGED_DIRS:
+        os.makedirs(os.path.join(output, directory), exist_ok=True)
+
+    cases: List[Dict[str, Any]] = []
+    owners: Dict[str, str] = {}
+
+    for shard_dir in shard_dirs:
+        with open(os.path.join(shard_dir, "test_cases.json"), "r") as file:
+            shard_cases = json.load(file)
+
+        for case in shard_cases:
+            if case["case"] in owners:
+                raise ValueError(
+                    f"Case {case['case']} is in both {owners[case['case']]} and {shard_dir}"  # noqa: E501
+                )
+            owners[case["case"]] = shard_dir
+        cases += shard_cases
+
+        for path in list_reports([shard_dir]):
+            _link_or_copy(path, os.path.join(output, os.path.basename(path)))
+
+        for directory in MERGED_DIRS:
+            source_dir = os.path.join(shard_dir, directory)
+            if not os.path.isdir(source_dir):
+                continue
+            for name in os.listdir(source_dir):
+                _link_or_copy(os.path.join(source_dir, name), os.path.join(output, directory, name))  # noqa: E501
+
+    with open(os.path.join(output, "test_cases.json"), "w") as file:
+        json.dump(cases, file, indent=4)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shard_dirs', required=True, nargs='+')
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    merge_shards(args.shard_dirs, args.output)
@@ -0,0 +1,200 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+# seconds between rewrites of the textfile
+TEXTFILE_INTERVAL = 10
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)  # noqa: E501
+
+_METRICS: List["_Metric"] = []
+# labels added to all samples (e.g. test group)
+_CONST_LABELS: Dict[str, str] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')  # noqa: E501
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    labels = {**_CONST_LABELS, **labels}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + "}"  # noqa: E501
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str,
+                 labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        _METRICS.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[x]) for x in self.label_names)
+
+    def _render_value(self, labels: Dict[str, str], value: Any) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {value}"]
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# TYPE {self.name} {self.type}",
+            f"# HELP {self.name} {_escape(self.documentation)}"
+        ]
+        with self._lock:
+            items = [(key, list(value) if isinstance(value, list) else value) for key, value in self._values.items()]  # noqa: E501
+        for key, value in items:
+            labels = dict(zip(self.label_names, key))
+            lines += self._render_value(labels, value)
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, labels: Dict[str, str], value: Any) -> List[str]:
+        return [f"{self.name}_total{_format_labels(labels)} {value}"]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str,
+                 labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # cumulative counts of buckets, sum and count
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])  # noqa: E501
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def _render_value(self, labels: Dict[str, str], value: Any) -> List[str]:
+        lines = []
+        for bound, count in zip(self.buckets, value):
+            bound = "+Inf" if bound == float("inf") else bound
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {count}")  # noqa: E501
+        lines.append(f"{self.name}_count{_format_labels(labels)} {value[-1]}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {value[-2]}")
+        return lines
+
+
+CASES = Counter("ama_cases", "Finished cases by status", ["status"])
+CASE_RETRIES = Counter("ama_case_retries", "Repeated tries of cases")
+QUEUED_CASES = Gauge("ama_queued_cases", "Cases which aren't started yet")
+RUNNING_CASES = Gauge("ama_running_cases", "Cases which are running")
+ARTIFACTS_IN_FLIGHT = Gauge("ama_artifacts_in_flight_bytes", "Estimated size of artifacts of running cases")  # noqa: E501
+TOOL_DURATION = Histogram("ama_tool_run_seconds", "Duration of tool runs", ["tool"])  # noqa: E501
+HASH_DURATION = Histogram("ama_hash_compare_seconds", "Duration of hash comparisons of outputs")  # noqa: E501
+FFPROBE_DURATION = Histogram("ama_ffprobe_seconds", "Duration of ffprobe runs")  # noqa: E501
+OUTPUT_BYTES = Counter("ama_output_bytes", "Bytes of compared outputs of tools")  # noqa: E501
+
+
+def set_const_labels(**labels: str) -> None:
+    _CONST_LABELS.update(labels)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n# EOF\n"
+
+
+def write_textfile(path: str) -> None:
+    # node_exporter must not read a partially written file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        file.write(render_metrics())
+    os.replace(temp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        # scrapes aren't logged
+        pass
+
+
+class MetricsExporter:
+    """Expose metrics over HTTP and/or in a textfile of node_exporter."""
+
+    def __init__(self, port: int = 0, address: str = "127.0.0.1",
+                 textfile: str = ""):
+        self.textfile = textfile
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        if port:
+            self._server = ThreadingHTTPServer((address, port), _MetricsHandler)  # noqa: E501
+            self._threads.append(threading.Thread(
+                target=self._server.serve_forever, name="metrics_http",
+                daemon=True
+            ))
+
+        if textfile:
+            self._threads.append(threading.Thread(
+                target=self._write_textfile, name="metrics_textfile",
+                daemon=True
+            ))
+
+        for thread in self._threads:
+            thread.start()
+
+    def _write_textfile(self) -> None:
+        while not self._stopped.wait(TEXTFILE_INTERVAL):
+            write_textfile(self.textfile)
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        # final values stay in the textfile
+        if self.textfile:
+            write_textfile(self.textfile)
@@ -0,0 +1,87 @@
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional, Set
+
+from jobs_launcher.core.config import main_logger
+from jobs_launcher.core.system_info import get_gpu
+
+# temp dir can be shared by users (e.g. /tmp), so each of them has a file.
+# Temp dir of Windows is per user already
+_USER_SUFFIX = f"_{os.getuid()}" if hasattr(os, "getuid") else ""
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), f"jobs_test_xilinx_system_info{_USER_SUFFIX}.json")  # noqa: E501
+# seconds while detected system info is reused by next runs
+SYSTEM_INFO_TTL = 24 * 3600
+
+_system_info: Optional["SystemInfo"] = None
+_lock = threading.Lock()
+
+
+class SystemInfo(NamedTuple):
+    render_device: Optional[str]
+    platform: str
+
+    @property
+    def conf(self) -> Set[str]:
+        # platform of skip_on and status_by_platform of cases
+        return set(self.platform) if not self.render_device else {self.platform, self.render_device}  # noqa: E501
+
+
+def _read_cache(path: str, ttl: float) -> Optional[SystemInfo]:
+    try:
+        with open(path, "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    # the cache can be on a drive shared by several machines
+    if cache.get("node") != platform.node() or time.time() - cache.get("time", 0) > ttl:  # noqa: E501
+        return None
+
+    try:
+        info = SystemInfo(**cache["info"])
+    except (KeyError, TypeError):
+        return None
+
+    # failed detection could be cached by older versions
+    return info if info.render_device else None
+
+
+def _write_cache(path: str, info: SystemInfo) -> None:
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, "w") as file:
+            json.dump({"node": platform.node(), "time": time.time(), "info": info._asdict()}, file)  # noqa: E501
+        os.replace(temp_path, path)
+    except OSError as e:
+        main_logger.warning(f"Can't cache system info to {path}: {e}")
+
+
+def get_system_info(cache_path: str = "",
+                    ttl: float = SYSTEM_INFO_TTL) -> SystemInfo:
+    """Detect the platform and the render device once per process.
+
+    Detected info is cached on disk and reused by next runs until it's older
+    than ttl seconds. 0 disables the disk cache. Info without a render device
+    isn't cached, because its detection could fail only this time.
+    """
+    global _system_info
+    cache_path = cache_path or DEFAULT_CACHE_PATH
+
+    with _lock:
+        if _system_info:
+            return _system_info
+
+        info = _read_cache(cache_path, ttl) if ttl > 0 else None
+        if info:
+            main_logger.info(f"Use cached system info from {cache_path}")
+        else:
+            info = SystemInfo(render_device=get_gpu(), platform=platform.system())  # noqa: E501
+            if ttl > 0 and info.render_device:
+                _write_cache(cache_path, info)
+
+        _system_info = info
+        return info
@@ -1,12 +1,55 @@
+import hashlib
 import json
 import os
-from subprocess import STDOUT, CalledProcessError, check_output
-from typing import Any, Dict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import threading
+from subprocess import (DEVNULL, PIPE, STDOUT, CalledProcessError, Popen,
+                        check_output)
+from typing import Any, Dict, List, Optional, Tuple
 
+from capture import FifoCapture
+from decoder import get_decoder_video_size
+from metrics import FFPROBE_DURATION, HASH_DURATION, OUTPUT_BYTES
+from tracer import traced
 from scaler import get_video_size
 
 from jobs_launcher.core.config import main_logger
 
+# header: only container and stream headers are read
+# packets: packets are counted without decoding
+# full: all frames are decoded and counted
+PROBE_DEPTHS = {
+    'header': [],
+    'packets': ['-count_packets'],
+    'full': ['-count_frames'],
+}
+
+# ffprobe results by command and identity of probed file
+_PROBE_CACHE: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+_PROBE_CACHE_LOCK = threading.Lock()
+
+# raw outputs may take several GB, so they are compared chunk by chunk
+COMPARE_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+@dataclass
+class CompareResult:
+    """Result of the comparison of two output files.
+
+    first_difference is the byte offset of the first differing byte. It stays
+    None if files are identical or if they have different sizes (such files
+    aren't read at all). sha1 is set only for identical files.
+    """
+    status: str
+    video_1: str
+    video_2: str
+    size_1: int = 0
+    size_2: int = 0
+    first_difference: Optional[int] = None
+    sha1: str = ''
+
 
 def run_executable(command):
     main_logger.debug(f"Run command {command}")
@@ -24,22 +67,22 @@ def run_executable(command):
     return (success, output)
 
 
-def get_ffprobe_info(case: Dict[str, Any], stream: str):
+@traced
+def get_ffprobe_info(case: Dict[str, Any], stream: str,
+                     depth: str = 'full') -> Dict[str, Any]:
+    command = [
+        'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams',
+        '-show_format'
+    ] + PROBE_DEPTHS[depth]
+
     # if 'ENC' in case['case'] or 'TRC' in case['case']:
     if case["case"].split('_')[0] in ('ENC', 'TRC', 'FFMPEG'):
-        command = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams',
-            '-show_format', '-count_frames', stream
-        ]
+        command += [stream]
     elif 'DEC' in case['case']:
         keys_list = case['prepare'].split()
-        video_size = keys_list[1]
-
-        if 'x' not in video_size:
-            video_size = keys_list[keys_list.index('--size')+1]
+        video_size = get_decoder_video_size(case)
         framerate = keys_list[keys_list.index('--fps')+1]
-        command = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', '-show_format', '-count_frames',  # noqa: E501
+        command += [
             '-f', 'rawvideo', '-video_size', video_size,
             '-framerate', framerate, stream
         ]
@@ -51,8 +94,7 @@ def get_ffprobe_info(case: Dict[str, Any], stream: str):
         video_index = int(filename.split('_')[-1].split('.')[0])
         video_size = get_video_size(case['simple_parameters'], video_index)
 
-        command = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', '-show_format', '-count_frames',  # noqa: E501
+        command += [
             '-f', 'rawvideo',
             # ffprobe doesn't work without video_size
             '-video_size', video_size,
@@ -60,21 +102,156 @@ def get_ffprobe_info(case: Dict[str, Any], stream: str):
             stream
         ]
 
-    success, output = run_executable(command)
+    try:
+        stat = os.stat(stream)
+    except OSError:
+        main_logger.error(f'Failed to get stream info for {stream}')
+        return {}
+
+    # the same file can be probed again only if it was rewritten
+    cache_key = (tuple(command), stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _PROBE_CACHE_LOCK:
+        if cache_key in _PROBE_CACHE:
+            return _PROBE_CACHE[cache_key]
 
-    if success:
-        return json.loads(output)
+    info = _run_ffprobe(command)
+
+    if info:
+        with _PROBE_CACHE_LOCK:
+            _PROBE_CACHE[cache_key] = info
     else:
         main_logger.error(f'Failed to get stream info for {stream}')
+
+    return info
+
+
+def _run_ffprobe(command: List[str]) -> Dict[str, Any]:
+    main_logger.debug(f"Run command {command}")
+    start_time = time.monotonic()
+    try:
+        process = Popen(command, stdout=PIPE, stderr=DEVNULL)
+    except OSError as e:
+        main_logger.error(f"Failed to run ffprobe: {e}")
         return {}
 
+    # only stream and format headers with frame or packet counts are printed
+    # (no -show_packets / -show_frames), so the output is a few KB whatever
+    # the size of the stream and it's parsed at once
+    try:
+        info = json.load(process.stdout)
+    except ValueError:
+        info = {}
+    finally:
+        process.stdout.close()
+        exit_code = process.wait()
+        FFPROBE_DURATION.observe(time.monotonic() - start_time)
 
-def hash_and_comapre(video_1, video_2):
-    # command = ['diff', '-sq', video_1, video_2]
-    command = ['sha1sum', video_1, video_2]
-    _, output = run_executable(command)
-    output = output.split()
-    if output[0] == output[2]:
-        return 'identical'
-    else:
-        return 'different'
+    return info if exit_code == 0 else {}
+
+
+def probe_streams(case: Dict[str, Any], output_stream: str,
+                  reference_stream: str,
+                  depth: str = 'full') -> Tuple[Dict[str, Any], Dict[str, Any]]:  # noqa: E501
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        output_info = executor.submit(get_ffprobe_info, case, output_stream, depth)  # noqa: E501
+        reference_info = executor.submit(get_ffprobe_info, case, reference_stream, depth)  # noqa: E501
+        return output_info.result(), reference_info.result()
+
+
+def _read_chunk(file, hasher) -> bytes:
+    chunk = file.read(COMPARE_CHUNK_SIZE)
+    # hashlib releases GIL for big buffers, so both files are hashed
+    # in parallel
+    hasher.update(chunk)
+    return chunk
+
+
+def _find_first_difference(chunk_1: bytes, chunk_2: bytes) -> int:
+    # bisect with slice comparisons (memcmp) instead of a byte by byte loop
+    low, high = 0, min(len(chunk_1), len(chunk_2))
+    if chunk_1[:high] == chunk_2[:high]:
+        return high
+
+    while high - low > 1:
+        middle = (low + high) // 2
+        if chunk_1[low:middle] == chunk_2[low:middle]:
+            low = middle
+        else:
+            high = middle
+
+    return low
+
+
+@traced
+def hash_and_comapre(video_1: str, video_2: str) -> CompareResult:
+    start_time = time.monotonic()
+    result = _hash_and_compare(video_1, video_2)
+    HASH_DURATION.observe(time.monotonic() - start_time)
+    OUTPUT_BYTES.inc(result.size_1 + result.size_2)
+    return result
+
+
+def _hash_and_compare(video_1: str, video_2: str) -> CompareResult:
+    result = CompareResult(status='different', video_1=video_1,
+                           video_2=video_2)
+
+    try:
+        result.size_1 = os.path.getsize(video_1)
+        result.size_2 = os.path.getsize(video_2)
+    except OSError as e:
+        main_logger.error(f"Failed to compare {video_1} and {video_2}: {e}")
+        return result
+
+    if result.size_1 != result.size_2:
+        return result
+
+    hash_1 = hashlib.sha1()
+    hash_2 = hashlib.sha1()
+    offset = 0
+
+    with open(video_1, 'rb') as file_1, open(video_2, 'rb') as file_2, \
+            ThreadPoolExecutor(max_workers=2) as executor:
+        while True:
+            future_1 = executor.submit(_read_chunk, file_1, hash_1)
+            future_2 = executor.submit(_read_chunk, file_2, hash_2)
+            chunk_1 = future_1.result()
+            chunk_2 = future_2.result()
+
+            if chunk_1 != chunk_2:
+                result.first_difference = offset + _find_first_difference(chunk_1, chunk_2)  # noqa: E501
+                return result
+
+            if not chunk_1:
+                break
+
+            offset += len(chunk_1)
+
+    result.status = 'identical'
+    result.sha1 = hash_1.hexdigest()
+
+    return result
+
+
+def compare_captures(captures_1: List[FifoCapture],
+                     captures_2: List[FifoCapture]) -> List[CompareResult]:
+    results = []
+
+    for capture_1, capture_2 in zip(captures_1, captures_2):
+        result = CompareResult(
+            status='different', video_1=capture_1.path,
+            video_2=capture_2.path, size_1=capture_1.size,
+            size_2=capture_2.size
+        )
+        captured = not capture_1.error and not capture_2.error
+
+        if captured and result.size_1 == result.size_2 and capture_1.sha1 == capture_2.sha1:  # noqa: E501
+            result.status = 'identical'
+            result.sha1 = capture_1.sha1
+
+        results.append(result)
+
+    if len(captures_1) != len(captures_2):
+        main_logger.error("Tools produced different number of outputs")
+        results.append(CompareResult(status='different', video_1='', video_2=''))  # noqa: E501
+
+    return results
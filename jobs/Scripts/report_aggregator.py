@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable
+
+RECORDS_NAME = "case_records.jsonl"
+SUMMARY_NAME = "summary.json"
+
+TOOLS = ("simple", "ma35")
+TIMING_KEYS = ("wall_time", "user_time", "system_time")
+# maximums of these values and their values before any report
+MAX_KEYS = {"wall_time": 0.0, "max_rss": 0}
+# seconds between rewrites of the summary while a group runs
+SUMMARY_INTERVAL = 1.0
+
+
+class ReportSummary:
+    """Running counts of statuses of cases and resource usage of their tools.
+
+    Reports can be removed, so a case which is reported again replaces its
+    previous try without summarizing all reports again.
+    """
+
+    def __init__(self):
+        self.statuses = Counter()
+        self.execution_time = 0.0
+        self.tools = {
+            tool: {"runs": 0, **{key: 0.0 for key in TIMING_KEYS}}
+            for tool in TOOLS
+        }
+        # values of maximums by tool and key. Maximums are searched again
+        # only if the last occurrence of the largest value is removed
+        self._values = {
+            tool: {key: Counter() for key in MAX_KEYS} for tool in TOOLS
+        }
+        self._maximums = {tool: dict(MAX_KEYS) for tool in TOOLS}
+
+    def add(self, report: Dict[str, Any]) -> None:
+        self._count(report, 1)
+
+    def remove(self, report: Dict[str, Any]) -> None:
+        self._count(report, -1)
+
+    def _count(self, report: Dict[str, Any], sign: int) -> None:
+        status = report.get("test_status", "")
+        self.statuses[status] += sign
+        if not self.statuses[status]:
+            del self.statuses[status]
+        self.execution_time += sign * (report.get("execution_time") or 0.0)
+
+        for tool, stats in self.tools.items():
+            if report.get(f"{tool}_wall_time") is None:
+                continue
+            stats["runs"] += sign
+            for key in TIMING_KEYS:
+                stats[key] += sign * (report.get(f"{tool}_{key}") or 0.0)
+
+            for key, default in MAX_KEYS.items():
+                values = self._values[tool][key]
+                value = report.get(f"{tool}_{key}") or default
+                values[value] += sign
+                if values[value]:
+                    self._maximums[tool][key] = max(self._maximums[tool][key], value)  # noqa: E501
+                    continue
+                del values[value]
+                if value == self._maximums[tool][key]:
+                    self._maximums[tool][key] = max(values, default=default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        tools = {
+            tool: {
+                **stats,
+                "max_wall_time": self._maximums[tool]["wall_time"],
+                "max_rss": self._maximums[tool]["max_rss"]
+            }
+            for tool, stats in self.tools.items()
+        }
+
+        return {
+            "cases": sum(self.statuses.values()),
+            "statuses": dict(self.statuses),
+            "execution_time": self.execution_time,
+            "tools": tools,
+            "updated": time.time()
+        }
+
+
+def summarize_reports(reports: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Count statuses of cases and aggregate resource usage of their tools."""
+    summary = ReportSummary()
+    for report in reports:
+        summary.add(report)
+
+    return summary.to_dict()
+
+
+def write_summary(path: str, summary: Dict[str, Any]) -> None:
+    # readers never see a partially written summary
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(summary, file, indent=4)
+    os.replace(temp_path, path)
+
+
+def read_records(path: str) -> Dict[str, Dict[str, Any]]:
+    """Get the last record of each case."""
+    reports = {}
+
+    if not os.path.exists(path):
+        return reports
+
+    with open(path, "r") as file:
+        for line in file:
+            try:
+                report = json.loads(line)
+            except ValueError:
+                # the last record is incomplete if a run was killed
+                continue
+            reports[report["test_case"]] = report
+
+    return reports
+
+
+class ReportAggregator:
+    """Reports of cases collected while a test group runs.
+
+    Each report is appended to case_records.jsonl when a try of a case
+    finishes. summary.json with counts of statuses and timings of tools is
+    rewritten at most once per SUMMARY_INTERVAL and when the group ends, so
+    progress of a group can be watched without reading reports of all cases.
+    """
+
+    def __init__(self, directory: str, selected: int, resume: bool = False):
+        self.records_path = os.path.join(directory, RECORDS_NAME)
+        self.summary_path = os.path.join(directory, SUMMARY_NAME)
+        self.selected = selected
+        self._reports = read_records(self.records_path) if resume else {}
+        self._summary = ReportSummary()
+        for report in self._reports.values():
+            self._summary.add(report)
+        self._file = open(self.records_path, "a" if resume else "w")
+        self._lock = threading.Lock()
+        self._written = 0.0
+
+    def add(self, report: Dict[str, Any]) -> None:
+        line = json.dumps(report, separators=(",", ":")) + "\n"
+
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            # only the last try of a case is counted
+            previous = self._reports.get(report["test_case"])
+            if previous:
+                self._summary.remove(previous)
+            self._reports[report["test_case"]] = report
+            self._summary.add(report)
+
+            if time.monotonic() - self._written >= SUMMARY_INTERVAL:
+                self._write_summary()
+
+    def _write_summary(self) -> None:
+        # called under the lock
+        summary = self._summary.to_dict()
+        summary["selected"] = self.selected
+        write_summary(self.summary_path, summary)
+        self._written = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+            self._write_summary()
@@ -1,154 +1,372 @@
+import copy
 import json
 import os
-import platform
+import shutil
+import threading
 import time
 import traceback
-
-from decoder import prepare_decoder_input, prepare_decoder_parameters
-from encoder import prepare_encoder_parameters, run_tool
+from concurrent.futures import ThreadPoolExecutor
+from argparse import Namespace
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from admission import AdmissionController
+from bitstream import locate_bitstream_difference
+from capture import FifoCapture, remove_fifos
+from cost_model import estimate_resources
+from decoder import (get_decoder_pix_fmt, get_decoder_video_size,
+                     prepare_decoder_input, prepare_decoder_parameters)
+from encoder import (ToolRun, prepare_encoder_input,
+                     prepare_encoder_parameters, run_tool, run_tools)
 from exceptions import ToolFailedException
-from ffmpeg import prepare_ffmpeg_parameters, measure_ffmpeg_performance
-from process_results import get_ffprobe_info, hash_and_comapre
-from scaler import prepare_scaler_parameters
+from ffmpeg import (benchmark_ffmpeg, measure_ffmpeg_performance,
+                    prepare_ffmpeg_parameters)
+from incremental import ResultStore, fingerprint_case
+from input_cache import InputCache
+from journal import FINAL_STATUSES, CaseJournal, read_journal
+from log_converter import wait_for_logs
+from platform_probe import SystemInfo, get_system_info
+from metrics import (ARTIFACTS_IN_FLIGHT, CASE_RETRIES, CASES, QUEUED_CASES,
+                     RUNNING_CASES, MetricsExporter, set_const_labels)
+from process_results import (CompareResult, compare_captures,
+                             hash_and_comapre, probe_streams)
+from scaler import ScalerOutput, get_scaler_outputs, prepare_scaler_parameters  # noqa: E501
+from report_aggregator import ReportAggregator
+from scratch import ScratchArea, keep_artifact
+from sharding import get_case_costs
+from supervisor import get_tool_timeout
+from timing_db import TimingDB, get_build_id
+from tracer import span, start_tracing, stop_tracing
 from transcoder import prepare_transcoder_input, prepare_transcoder_parameters
-from utils import (copy_test_cases, is_case_skipped, prepare_empty_reports,
-                   save_logs, save_results, remove_artifact)
+from utils import (JOURNAL_NAME, PhaseTimer, copy_test_cases,
+                   get_iterated_streams, is_case_skipped,
+                   prepare_empty_reports, save_logs, save_results,
+                   remove_artifact)
+from yuv_compare import locate_frame_difference
 
 from jobs_launcher.core.config import main_logger
-from jobs_launcher.core.system_info import get_gpu
 
 
-def execute_tests(args, current_conf):
-    rc = 0
-    test_cases_path = os.path.join(os.path.abspath(args.output), "test_cases.json")  # noqa: E501
-    with open(test_cases_path, "r") as json_file:
-        cases = json.load(json_file)
+BINARIES_COMMON_PATH = '/opt/amd/ama/'
+# directory of results where inputs are cached if there is no input cache
+RUN_INPUTS_DIR = "Inputs"
+# max number of outputs of a case compared at the same time
+COMPARE_WORKERS = 4
 
-    logs_path = os.path.join(args.output, "tool_logs")
-    # keep for ffmpeg testing
-    # if platform.system() == 'Windows':
-    #     mediainfo = os.path.join(args.tool_path, "MediaInfo.exe")
-    # else:
-    #     mediainfo = 'mediainfo'
 
-    for case in [x for x in cases if not is_case_skipped(x, current_conf)]:
-        # select tools to execute
-        binaries_common_path = '/opt/amd/ama/'
-        if args.tools == "SimpleSamples":
-            if "Encoder" in args.test_group:
-                xma_tool_path = os.path.join(
-                    binaries_common_path, 'ma35', 'bin', 'ma35_encoder_app'
-                )
-                simple_tool_path = os.path.join(
-                    binaries_common_path, 'amf_Release', 'bin', 'SimpleEncoderAMA'
-                )
-            elif "Decoder" in args.test_group:
-                xma_tool_path = os.path.join(
-                    binaries_common_path, 'ma35', 'bin', 'ma35_decoder_app'
-                )
-                simple_tool_path = os.path.join(
-                    binaries_common_path, 'amf_Release', 'bin', 'SimpleDecoderAMA'
-                )
-                encoder_path = os.path.join(
-                    binaries_common_path, 'amf_Release', 'bin', 'SimpleEncoderAMA'
-                )
-            elif "Scaler" in args.test_group:
-                xma_tool_path = os.path.join(
-                    binaries_common_path, 'ma35', 'bin', 'ma35_scaler_app'
-                )
-                simple_tool_path = os.path.join(
-                    binaries_common_path, 'amf_Release', 'bin', 'SimpleScalerAMA'
-                )
-            elif "Transcoder" in args.test_group:
-                xma_tool_path = os.path.join(
-                    binaries_common_path, 'ma35', 'bin', 'ma35_transcoder_app'
-                )
-                simple_tool_path = os.path.join(
-                    binaries_common_path, 'amf_Release', 'bin',
-                    'SimpleTranscoderAMA'
-                )
-                encoder_path = os.path.join(
-                    binaries_common_path, 'amf_Release', 'bin', 'SimpleEncoderAMA'
-                )
-        elif args.tools == "FFMPEG":
-            amf_ffmpeg_path = os.path.join(
-                binaries_common_path, 'amf_Release', 'bin', 'ffmpeg'
+def select_tools(args) -> Dict[str, str]:
+    # select tools to execute
+    tools = {}
+    if args.tools == "SimpleSamples":
+        if "Encoder" in args.test_group:
+            tools["ma35"] = os.path.join(
+                BINARIES_COMMON_PATH, 'ma35', 'bin', 'ma35_encoder_app'
+            )
+            tools["simple"] = os.path.join(
+                BINARIES_COMMON_PATH, 'amf_Release', 'bin', 'SimpleEncoderAMA'
+            )
+        elif "Decoder" in args.test_group:
+            tools["ma35"] = os.path.join(
+                BINARIES_COMMON_PATH, 'ma35', 'bin', 'ma35_decoder_app'
+            )
+            tools["simple"] = os.path.join(
+                BINARIES_COMMON_PATH, 'amf_Release', 'bin', 'SimpleDecoderAMA'
+            )
+            tools["encoder"] = os.path.join(
+                BINARIES_COMMON_PATH, 'amf_Release', 'bin', 'SimpleEncoderAMA'
+            )
+        elif "Scaler" in args.test_group:
+            tools["ma35"] = os.path.join(
+                BINARIES_COMMON_PATH, 'ma35', 'bin', 'ma35_scaler_app'
+            )
+            tools["simple"] = os.path.join(
+                BINARIES_COMMON_PATH, 'amf_Release', 'bin', 'SimpleScalerAMA'
+            )
+        elif "Transcoder" in args.test_group:
+            tools["ma35"] = os.path.join(
+                BINARIES_COMMON_PATH, 'ma35', 'bin', 'ma35_transcoder_app'
             )
-            xma_ffmpeg_path = os.path.join(
-                binaries_common_path, 'ma35', 'bin', 'ffmpeg'
+            tools["simple"] = os.path.join(
+                BINARIES_COMMON_PATH, 'amf_Release', 'bin',
+                'SimpleTranscoderAMA'
             )
+            tools["encoder"] = os.path.join(
+                BINARIES_COMMON_PATH, 'amf_Release', 'bin', 'SimpleEncoderAMA'
+            )
+    elif args.tools == "FFMPEG":
+        tools["simple"] = os.path.join(
+            BINARIES_COMMON_PATH, 'amf_Release', 'bin', 'ffmpeg'
+        )
+        tools["ma35"] = os.path.join(
+            BINARIES_COMMON_PATH, 'ma35', 'bin', 'ffmpeg'
+        )
+
+    return tools
+
+
+def prepare_parameters(args, case: Dict[str, Any], output_path: str,
+                       fifo: bool = False,
+                       input_path: str = '') -> Tuple[str, str, str, str, str]:  # noqa: E501
+    """Prepare keys of simple and ma35 tools of a case.
+
+    Inputs of encoders are placed to input_path if it's set.
+
+    Returns:
+        Tuple[str, str, str, str, str]: keys of simple tool, keys of ma35
+            tool, input stream, output of simple tool and output of ma35 tool
+    """
+    if "Encoder" in args.test_group:
+        prepared_keys, input_stream, output_stream = prepare_encoder_parameters(  # noqa: E501
+            case, output_path=output_path, input_path=input_path,
+            simple_encoder=True
+        )
+        ma35_prepared_keys, input_stream, reference_stream = prepare_encoder_parameters(  # noqa: E501
+            case, output_path=output_path, input_path=input_path,
+            simple_encoder=False
+        )
+    elif "Decoder" in args.test_group:
+        # prepare output file and keys
+        prepared_keys, input_stream, output_stream = prepare_decoder_parameters(  # noqa: E501
+            case, output_path=output_path, simple_decoder=True, fifo=fifo
+        )
+        ma35_prepared_keys, input_stream, reference_stream = prepare_decoder_parameters(  # noqa: E501
+            case, output_path=output_path, simple_decoder=False, fifo=fifo
+        )
+    elif "Scaler" in args.test_group:
+        prepared_keys, input_stream, output_stream = prepare_scaler_parameters(  # noqa: E501
+            case, output_path=output_path, simple_scaler=True, fifo=fifo
+        )
+        ma35_prepared_keys, input_stream, reference_stream = prepare_scaler_parameters(  # noqa: E501
+            case, output_path=output_path, simple_scaler=False, fifo=fifo
+        )
+    elif "Transcoder" in args.test_group:
+        prepared_keys, input_stream, output_stream = prepare_transcoder_parameters(  # noqa: E501
+            case, output_path=output_path, simple_transcoder=True
+        )
+        ma35_prepared_keys, input_stream, reference_stream = prepare_transcoder_parameters(  # noqa: E501
+            case, output_path=output_path, simple_transcoder=False
+        )
+
+    return prepared_keys, ma35_prepared_keys, input_stream, output_stream, reference_stream  # noqa: E501
+
+
+def prepare_input(args, case: Dict[str, Any], encoder: str, input_stream: str,
+                  log: str, error_messages: set, *,
+                  cache: Optional[InputCache] = None,
+                  timeout: Optional[float] = None) -> None:
+    # encoders read generated raw streams, decoders and transcoders read
+    # streams prepared by encoder
+    if "Encoder" in args.test_group:
+        prepare_encoder_input(case, input_stream, frames=args.input_frames,
+                              pattern=args.input_pattern, cache=cache)
+    elif "Decoder" in args.test_group:
+        prepare_decoder_input(case, encoder, input_stream, log,
+                              error_messages, cache=cache, timeout=timeout)
+    elif "Transcoder" in args.test_group:
+        prepare_transcoder_input(case, encoder, input_stream, log,
+                                 error_messages, cache=cache, timeout=timeout)
+
+
+def get_fifo_outputs(args, case: Dict[str, Any], output_stream: str,
+                     simple: bool) -> List[str]:
+    if "Scaler" in args.test_group:
+        keys = case['simple_parameters' if simple else 'xma_parameters']
+        return get_iterated_streams(keys, output_stream, 'yuv')
+
+    return [output_stream]
+
+
+def run_case_tools(args, runs: List[ToolRun],
+                   error_messages: set) -> List[List[FifoCapture]]:
+    # encoders, decoders and transcoders read prepared input, so their simple
+    # and ma35 tools don't depend on each other. Scalers read input dumped by
+    # the simple tool
+    if args.concurrent_tools and "Scaler" not in args.test_group:
+        return run_tools(runs, error_messages)
+
+    return [
+        run_tool(run.tool, run.params, run.log, error_messages,
+                 captures=run.captures, timeout=run.timeout, usage=run.usage,
+                 spill=run.spill)
+        for run in runs
+    ]
+
+
+def release_outputs(compare_result: CompareResult,
+                    keep_path: Optional[str] = None) -> None:
+    # outputs of failed comparisons are moved to keep_path if it's set,
+    # others are removed as they may be too heavy
+    if keep_path and compare_result.status != 'identical':
+        compare_result.video_1 = keep_artifact(compare_result.video_1, keep_path)  # noqa: E501
+        compare_result.video_2 = keep_artifact(compare_result.video_2, keep_path)  # noqa: E501
+    else:
+        remove_artifact(compare_result.video_1)
+        remove_artifact(compare_result.video_2)
+
+
+def compare_scaler_output(
+    output: ScalerOutput, keep_path: Optional[str] = None
+) -> Tuple[CompareResult, Optional[Dict[str, Any]]]:
+    compare_result = hash_and_comapre(output.simple, output.ma35)
+    frame_diff = None
+
+    if compare_result.status != 'identical':
+        width, height, pix_fmt = output.format
+        try:
+            # outputs of a case differ in resolution and format
+            frame_diff = {
+                'output': output.index,
+                'video_1': os.path.basename(output.simple),
+                'video_2': os.path.basename(output.ma35),
+                **locate_frame_difference(
+                    output.simple, output.ma35, width, height, pix_fmt
+                )
+            }
+        except (OSError, ValueError, KeyError) as e:
+            main_logger.error(f"Failed to compare frames of {output.simple}: {e}")  # noqa: E501
+
+    release_outputs(compare_result, keep_path)
+
+    return compare_result, frame_diff
+
+
+def execute_case(args, case: Dict[str, Any], *other, **kwargs) -> int:
+    # the case is a span on the track of its worker, its phases are nested
+    with span(case["case"], "case"):
+        return _execute_case(args, case, *other, **kwargs)
+
 
-        output_path = os.path.join(args.output, "Color")
-        if not os.path.exists(output_path):
-            os.makedirs(output_path)
+def _execute_case(args, case: Dict[str, Any], cases: List[Dict[str, Any]],
+                  tools: Dict[str, str],
+                  input_cache: Optional[InputCache] = None,
+                  result_store: Optional[ResultStore] = None,
+                  timing_db: Optional[TimingDB] = None,
+                  scratch: Optional[ScratchArea] = None,
+                  admission: Optional[AdmissionController] = None) -> int:
+    rc = 0
+    logs_path = os.path.join(args.output, "tool_logs")
+    output_path = os.path.join(args.output, "Color")
+
+    simple_tool_path = tools.get("simple")
+    xma_tool_path = tools.get("ma35")
+    encoder_path = tools.get("encoder")
+
+    if args.tools == "FFMPEG":
+        simple_log = os.path.join(logs_path, f"{case['case']}_amf.log")
+    else:
+        simple_log = os.path.join(logs_path, f"{case['case']}_simple.log")
+    ma35_log = os.path.join(logs_path, f"{case['case']}_ma35.log")
+    input_preparation_log = os.path.join(logs_path, f"{case['case']}_input_preparation.log")  # noqa: E501
+
+    # named pipes are used for raw outputs only
+    use_fifo = args.fifo_outputs and ("Decoder" in args.test_group or "Scaler" in args.test_group)  # noqa: E501
+
+    QUEUED_CASES.dec()
+    RUNNING_CASES.inc()
+
+    fingerprint = None
+    if result_store:
+        try:
+            fingerprint = fingerprint_case(args, case, tools)
+        except OSError as e:
+            main_logger.warning(f"Can't get fingerprint of case {case['case']}: {e}")  # noqa: E501
+
+    previous_result = result_store.get(fingerprint) if fingerprint else None
+    if previous_result:
+        main_logger.info(f"Reuse result of case {case['case']} from {previous_result['date_time']}")  # noqa: E501
+        case["reused"] = True
+        case["prepared_keys_simple"] = previous_result["prepared_keys_simple"]
+        case["prepared_keys_xma"] = previous_result["prepared_keys_xma"]
+        case["compare_results"] = previous_result["compare_results"]
+        case["script_info"].append(
+            f"Result is reused from the run at {previous_result['date_time']}"
+        )
+        save_results(args, case, cases,
+                     execution_time=previous_result["execution_time"],
+                     test_case_status="passed")
+        RUNNING_CASES.dec()
+        CASES.inc(status=case["status"])
+        return rc
+
+    case_timeout = args.case_timeout
+    predicted_timeout = timing_db.predict_timeout(case["case"], args.timeout_factor) if timing_db else None  # noqa: E501
+    if predicted_timeout:
+        main_logger.info(f"Predicted timeout of tries of case {case['case']}: {predicted_timeout:.1f} s")  # noqa: E501
+        case_timeout = min(case_timeout, predicted_timeout) if case_timeout else predicted_timeout  # noqa: E501
+
+    # whatever was acquired for the case is released even if it couldn't
+    # be prepared or its results couldn't be saved
+    scratch_path = None
+    admitted = None
+    in_flight = 0
+    resources = None
+    test_case_status = "error"
 
+    try:
+        # artifacts are written to the scratch area if they fit there. Only
+        # artifacts of failed cases are moved to results then
+        resources = estimate_resources(args, case)
+        scratch_path = scratch.allocate(case["case"], resources.disk) if scratch else None  # noqa: E501
+        work_path = scratch_path or output_path
+        keep_path = output_path if scratch_path else None
+        # generated inputs of encoders are links to the input cache
+        input_path = output_path if "Encoder" in args.test_group else work_path
+
+        if admission:
+            # artifacts in the scratch area don't take space of results
+            case_resources = resources._replace(disk=0) if scratch_path else resources  # noqa: E501
+            admission.acquire(case["case"], case_resources)
+            admitted = case_resources
+
+        ARTIFACTS_IN_FLIGHT.inc(resources.disk)
+        in_flight = resources.disk
         case_start_time = time.time()
         current_try = 0
+        # timeouts are predicted from durations of single tries
+        try_time = None
 
         max_tries = args.retries
+        error_messages = set()
 
         while current_try < max_tries:
             main_logger.info(
                 f"Start test case {case['case']}. Try: {current_try}"
             )
             error_messages = set()
+            try_start_time = time.time()
+            if current_try:
+                CASE_RETRIES.inc()
+            case["tool_usage"] = {"simple": {}, "ma35": {}}
+            phases = PhaseTimer()
+            phases.start("prepare_parameters")
+            case_deadline = None
+            if case_timeout:
+                case_deadline = time.monotonic() + case_timeout
+            # the log of the previous try can still be converted, so only
+            # a log written by this try is saved
+            preparation_log = None
 
             try:
                 if args.tools == "SimpleSamples":
                     # prepare parameters/keys for simple tool and xma
-                    simple_log = os.path.join(
-                        logs_path, f"{case['case']}_simple.log"
+                    prepared_keys, ma35_prepared_keys, input_stream, output_stream, reference_stream = prepare_parameters(  # noqa: E501
+                        args, case, work_path, fifo=use_fifo,
+                        input_path=input_path
                     )
-                    ma35_log = os.path.join(logs_path, f"{case['case']}_ma35.log")
-                    input_preparation_log = os.path.join(logs_path, f"{case['case']}_input_preparation.log")  # noqa: E501
-
-                    if "Encoder" in args.test_group:
-                        prepared_keys, input_stream, output_stream = prepare_encoder_parameters(
-                            case, output_path=output_path,
-                            simple_encoder=True
-                        )
-                        ma35_prepared_keys, input_stream, reference_stream = prepare_encoder_parameters(  # noqa: E501
-                            case, output_path=output_path,
-                            simple_encoder=False
-                        )
-                    elif "Decoder" in args.test_group:
-                        # prepare output file and keys
-                        prepared_keys, input_stream, output_stream = prepare_decoder_parameters(  # noqa: E501
-                            case, output_path=output_path,
-                            simple_decoder=True
-                        )
-                        ma35_prepared_keys, input_stream, reference_stream = prepare_decoder_parameters(  # noqa: E501
-                            case, output_path=output_path,
-                            simple_decoder=False
-                        )
 
-                        # prepare input file for decoder
-                        prepare_decoder_input(
-                            case, encoder_path, input_stream,
-                            input_preparation_log
-                        )
-                    elif "Scaler" in args.test_group:
-                        prepared_keys, input_stream, output_stream = prepare_scaler_parameters(  # noqa: E501
-                            case, output_path=output_path,
-                            simple_scaler=True
-                        )
-                        ma35_prepared_keys, input_stream, reference_stream = prepare_scaler_parameters(  # noqa: E501
-                            case, output_path=output_path,
-                            simple_scaler=False
-                        )
-                    elif "Transcoder" in args.test_group:
-                        prepared_keys, input_stream, output_stream = prepare_transcoder_parameters(  # noqa: E501
-                            case, output_path=output_path,
-                            simple_transcoder=True
-                        )
-                        ma35_prepared_keys, input_stream, reference_stream = prepare_transcoder_parameters(  # noqa: E501
-                            case, output_path=output_path,
-                            simple_transcoder=False
-                        )
-                        # prepare input file for transcoder
-                        prepare_transcoder_input(
-                            case, encoder_path, input_stream,
-                            input_preparation_log
+                    if "Scaler" not in args.test_group:
+                        phases.start("prepare_input")
+                        if "Encoder" not in args.test_group:
+                            # inputs of other groups are prepared by a tool
+                            preparation_log = input_preparation_log
+                        prepare_input(
+                            args, case, encoder_path, input_stream,
+                            input_preparation_log, error_messages,
+                            cache=input_cache,
+                            timeout=get_tool_timeout(
+                                case.get('prepare', ''), args.tool_timeout,
+                                case_deadline
+                            )
                         )
 
                     case["script_info"].append(
@@ -158,70 +376,118 @@ def execute_tests(args, current_conf):
                         f"MA35 parameters: {ma35_prepared_keys}"
                     )
 
+                    simple_timeout = get_tool_timeout(
+                        prepared_keys, args.tool_timeout, case_deadline
+                    )
+                    ma35_timeout = get_tool_timeout(
+                        ma35_prepared_keys, args.tool_timeout, case_deadline
+                    )
+
                     # main logic
-                    run_tool(simple_tool_path, prepared_keys, simple_log, error_messages)
-                    run_tool(xma_tool_path, ma35_prepared_keys, ma35_log, error_messages)
+                    phases.start("run_tools")
+                    fifo_passed = False
+                    if use_fifo:
+                        # with fifo_spill outputs are also written to files
+                        # while they are hashed. They are kept only if they
+                        # differ, so tools don't run again to save them
+                        simple_captures, ma35_captures = run_case_tools(args, [
+                            ToolRun(simple_tool_path, prepared_keys, simple_log,  # noqa: E501
+                                    get_fifo_outputs(args, case, output_stream, simple=True),  # noqa: E501
+                                    simple_timeout, case["tool_usage"]["simple"],  # noqa: E501
+                                    spill=args.fifo_spill),
+                            ToolRun(xma_tool_path, ma35_prepared_keys, ma35_log,  # noqa: E501
+                                    get_fifo_outputs(args, case, reference_stream, simple=False),  # noqa: E501
+                                    ma35_timeout, case["tool_usage"]["ma35"],
+                                    spill=args.fifo_spill)
+                        ], error_messages)
+                        fifo_results = compare_captures(simple_captures, ma35_captures)  # noqa: E501
+                        fifo_passed = all(x.status == 'identical' for x in fifo_results)  # noqa: E501
+
+                        for capture in simple_captures + ma35_captures:
+                            if fifo_passed:
+                                capture.discard()
+                            else:
+                                capture.keep()
+
+                        if not fifo_passed and not args.fifo_spill:
+                            # outputs are needed on disk for further analysis
+                            main_logger.info("Outputs are different. Run tools again to save them")  # noqa: E501
+
+                    if not fifo_passed and not (use_fifo and args.fifo_spill):
+                        run_case_tools(args, [
+                            ToolRun(simple_tool_path, prepared_keys, simple_log,  # noqa: E501
+                                    timeout=simple_timeout,
+                                    usage=case["tool_usage"]["simple"]),
+                            ToolRun(xma_tool_path, ma35_prepared_keys, ma35_log,  # noqa: E501
+                                    timeout=ma35_timeout,
+                                    usage=case["tool_usage"]["ma35"])
+                        ], error_messages)
 
                     execution_time = time.time() - case_start_time
 
                     # results processing
+                    phases.start("compare")
                     reference_stream_params = {}
                     output_stream_params = {}
+                    case["compare_results"] = []
+                    case["frame_diff"] = []
 
-                    if "Scaler" not in args.test_group:
+                    if fifo_passed:
+                        test_case_status = "passed"
+                        case["compare_results"] = [asdict(x) for x in fifo_results]  # noqa: E501
+                        remove_artifact(input_stream)
+                    elif "Scaler" not in args.test_group:
                         compare_result = hash_and_comapre(output_stream, reference_stream)  # noqa: E501
 
-                        if compare_result == 'identical':
+                        if compare_result.status == 'identical':
                             test_case_status = "passed"
+                        elif "Decoder" in args.test_group:
+                            test_case_status = "failed"
+                            # ffprobe can't say where raw outputs diverge
+                            try:
+                                width, height = get_decoder_video_size(case).split('x')  # noqa: E501
+                                case["frame_diff"].append(locate_frame_difference(  # noqa: E501
+                                    output_stream, reference_stream,
+                                    int(width), int(height),
+                                    get_decoder_pix_fmt(case)
+                                ))
+                            except (OSError, ValueError, KeyError) as e:
+                                main_logger.error(f"Failed to compare frames of case {case['case']}: {e}")  # noqa: E501
                         else:
                             test_case_status = "failed"
-                            output_stream_params = get_ffprobe_info(case, output_stream)  # noqa: E501
-                            reference_stream_params = get_ffprobe_info(
-                                case, reference_stream
+                            # encoded outputs are split into frames without
+                            # decoding them
+                            try:
+                                case["frame_diff"].append(locate_bitstream_difference(  # noqa: E501
+                                    output_stream, reference_stream
+                                ))
+                            except (OSError, ValueError) as e:
+                                main_logger.error(f"Failed to compare bitstreams of case {case['case']}: {e}")  # noqa: E501
+                            output_stream_params, reference_stream_params = probe_streams(  # noqa: E501
+                                case, output_stream, reference_stream,
+                                depth=args.probe_depth
                             )
 
-                        # remove artifacts as they may be too heavy
-                        remove_artifact(output_stream)
-                        remove_artifact(reference_stream)
+                        release_outputs(compare_result, keep_path)
+                        case["compare_results"].append(asdict(compare_result))
                         remove_artifact(input_stream)
                     else:
                         output_stream_params = []
                         reference_stream_params = []
 
-                        output_dir = os.path.split(output_stream)[0]
-                        output_filename = os.path.split(output_stream)[1]
-                        output_files = os.listdir(output_dir)
-                        ma35_res = []
-                        simple_res = []
-
-                        for name in output_files:
-                            if '_ma35' in name and f'{output_filename}_' in name:
-                                ma35_res.append(name)
-                            if '_ma35' not in name and f'{output_filename}_' in name:  # noqa: E501
-                                simple_res.append(name)
-
-                        ma35_res.sort()
-                        simple_res.sort()
-
-                        for index, value in enumerate(simple_res):
-                            output_stream = os.path.join(output_dir, value)
-                            reference_stream = os.path.join(output_dir, ma35_res[index])  # noqa: E501
-
-                            compare_result = hash_and_comapre(output_stream, reference_stream)  # noqa: E501
-
-                            if compare_result != 'identical':
-                                output_info = get_ffprobe_info(case, output_stream)
-                                reference_info = get_ffprobe_info(case, reference_stream)  # noqa: E501
-
-                                output_stream_params.append(output_info)
-                                reference_stream_params.append(reference_info)  # noqa: E501
+                        outputs = get_scaler_outputs(case, output_stream, reference_stream)  # noqa: E501
+                        # threads are named after the worker of the case in logs and traces  # noqa: E501
+                        with ThreadPoolExecutor(max_workers=min(len(outputs), COMPARE_WORKERS) or 1,  # noqa: E501
+                                                thread_name_prefix=f"{threading.current_thread().name}_compare") as executor:  # noqa: E501
+                            results = executor.map(compare_scaler_output, outputs, [keep_path] * len(outputs))  # noqa: E501
+                            for output, (compare_result, frame_diff) in zip(outputs, results):  # noqa: E501
+                                case["compare_results"].append({"output": output.index, **asdict(compare_result)})  # noqa: E501
+                                if frame_diff:
+                                    case["frame_diff"].append(frame_diff)
 
-                            # remove artifacts as they may be too heavy
-                            remove_artifact(output_stream)
-                            remove_artifact(reference_stream)
-                            remove_artifact(input_stream)
+                        remove_artifact(input_stream)
 
-                        if output_stream_params == []:
+                        if all(x['status'] == 'identical' for x in case["compare_results"]):  # noqa: E501
                             test_case_status = "passed"
                         else:
                             test_case_status = "failed"
@@ -229,17 +495,16 @@ def execute_tests(args, current_conf):
                     case["ref_stream_params"] = reference_stream_params
                     case["output_stream_params"] = output_stream_params
 
+                    phases.start("save_logs")
                     save_logs(args, case, ma35_log)
                     save_logs(args, case, simple_log)
 
-                    if os.path.exists(input_preparation_log):
-                        save_logs(args, case, input_preparation_log)
+                    if preparation_log:
+                        save_logs(args, case, preparation_log)
                 elif args.tools == "FFMPEG":
-                    amf_log = os.path.join(
-                        logs_path, f"{case['case']}_amf.log"
-                    )
-                    simple_log = amf_log
-                    ma35_log = os.path.join(logs_path, f"{case['case']}_ma35.log")
+                    amf_log = simple_log
+                    amf_bench_log = os.path.join(logs_path, f"{case['case']}_amf_bench.log")  # noqa: E501
+                    ma35_bench_log = os.path.join(logs_path, f"{case['case']}_ma35_bench.log")  # noqa: E501
 
                     prepared_keys, input_stream, output_stream = prepare_ffmpeg_parameters(
                         case, input_path=args.tool_path, output_path=output_path, amf_ffmpeg=True
@@ -257,35 +522,64 @@ def execute_tests(args, current_conf):
                     )
 
                     # main logic
-                    run_tool(amf_ffmpeg_path, prepared_keys, amf_log, error_messages)
-                    run_tool(xma_ffmpeg_path, xma_prepared_keys, ma35_log, error_messages)
+                    phases.start("run_tools")
+                    run_tool(simple_tool_path, prepared_keys, amf_log, error_messages,
+                             timeout=get_tool_timeout(prepared_keys, args.tool_timeout, case_deadline),  # noqa: E501
+                             usage=case["tool_usage"]["simple"])
+                    run_tool(xma_tool_path, xma_prepared_keys, ma35_log, error_messages,
+                             timeout=get_tool_timeout(xma_prepared_keys, args.tool_timeout, case_deadline),  # noqa: E501
+                             usage=case["tool_usage"]["ma35"])
                     execution_time = time.time() - case_start_time
 
                     # results processing
+                    phases.start("compare")
                     reference_stream_params = {}
                     output_stream_params = {}
+                    case["compare_results"] = []
 
                     # compare hashes
                     compare_result = hash_and_comapre(output_stream, reference_stream)  # noqa: E501
+                    case["compare_results"].append(asdict(compare_result))
 
-                    if compare_result == 'identical':
+                    if compare_result.status == 'identical':
                         test_case_status = "passed"
                     else:
                         test_case_status = "failed"
-                        output_stream_params = get_ffprobe_info(case, output_stream)  # noqa: E501
-                        reference_stream_params = get_ffprobe_info(
-                            case, reference_stream
+                        output_stream_params, reference_stream_params = probe_streams(  # noqa: E501
+                            case, output_stream, reference_stream,
+                            depth=args.probe_depth
                         )
 
                     case["ref_stream_params"] = reference_stream_params
                     case["output_stream_params"] = output_stream_params
 
                     # measure preformance
-                    measure_ffmpeg_performance(amf_log, ma35_log, error_messages=error_messages)
+                    phases.start("benchmark")
+                    if args.ffmpeg_bench_runs:
+                        bench_runs = {
+                            "amf": (simple_tool_path, prepared_keys, amf_bench_log,  # noqa: E501
+                                    get_tool_timeout(prepared_keys, args.tool_timeout, case_deadline)),  # noqa: E501
+                            "ma35": (xma_tool_path, xma_prepared_keys, ma35_bench_log,  # noqa: E501
+                                     get_tool_timeout(xma_prepared_keys, args.tool_timeout, case_deadline))  # noqa: E501
+                        }
+                        case["performance"] = benchmark_ffmpeg(
+                            bench_runs, repetitions=args.ffmpeg_bench_runs,
+                            warmup=args.ffmpeg_bench_warmup,
+                            error_messages=error_messages
+                        )
+                    else:
+                        case["performance"] = measure_ffmpeg_performance(amf_log, ma35_log, error_messages=error_messages)  # noqa: E501
 
+                    phases.start("save_logs")
                     save_logs(args, case, ma35_log)
                     save_logs(args, case, amf_log)
 
+                    if args.ffmpeg_bench_runs:
+                        save_logs(args, case, ma35_bench_log)
+                        save_logs(args, case, amf_bench_log)
+
+                phases.stop()
+                case["phase_times"] = phases.phases
                 save_results(args, case, cases,
                              execution_time=execution_time,
                              test_case_status=test_case_status,
@@ -294,11 +588,18 @@ def execute_tests(args, current_conf):
             except Exception as e:
                 execution_time = time.time() - case_start_time
 
+                if use_fifo:
+                    remove_fifos(work_path, case["case"])
+
+                phases.start("save_logs")
                 save_logs(args, case, ma35_log)
                 save_logs(args, case, simple_log)
 
-                if os.path.exists(input_preparation_log):
-                    save_logs(args, case, input_preparation_log)
+                if preparation_log:
+                    save_logs(args, case, preparation_log)
+
+                phases.stop()
+                case["phase_times"] = phases.phases
 
                 test_case_status = "error"
                 if case["status"] == "observed":
@@ -313,6 +614,7 @@ def execute_tests(args, current_conf):
                 main_logger.error(f"Traceback: {traceback.format_exc()}")
             finally:
                 current_try += 1
+                try_time = time.time() - try_start_time
                 main_logger.info("End of test case")
         else:
             case_name = case["case"]
@@ -326,11 +628,191 @@ def execute_tests(args, current_conf):
                          execution_time=execution_time,
                          test_case_status=test_case_status,
                          error_messages=error_messages)
+    except Exception as e:
+        main_logger.error(f"Failed to execute case {case['case']}: {str(e)}")  # noqa: E501
+        main_logger.error(f"Traceback: {traceback.format_exc()}")
+        try:
+            save_results(args, case, cases,
+                         test_case_status="observed" if case["status"] == "observed" else "error",  # noqa: E501
+                         error_messages=[str(e)])
+        except Exception as save_error:
+            main_logger.error(f"Failed to save results of case {case['case']}: {str(save_error)}")  # noqa: E501
+        return -1
+    finally:
+        if admitted:
+            admission.release(admitted)
+
+        ARTIFACTS_IN_FLIGHT.dec(in_flight)
+        RUNNING_CASES.dec()
+        CASES.inc(status=case["status"])
+
+        if scratch_path:
+            scratch.release(case["case"], resources.disk,
+                            keep_path=keep_path if test_case_status != "passed" else None)  # noqa: E501
+
+    if fingerprint and case["status"] == "passed":
+        result_store.put(fingerprint, case, execution_time)
+
+    if timing_db:
+        timing_db.record(case, case["status"], execution_time, try_time)
 
     return rc
 
 
-def run_tests(args):
+def execute_tests(args, current_conf,
+                  admission: Optional[AdmissionController] = None):
+    rc = 0
+    test_cases_path = os.path.join(os.path.abspath(args.output), "test_cases.json")  # noqa: E501
+    with open(test_cases_path, "r") as json_file:
+        cases = json.load(json_file)
+
+    # copies of cases as of their last save, test_cases.json is written
+    # from them
+    args.saved_cases = {x["case"]: copy.deepcopy(x) for x in cases}
+    # conversions of logs of the group
+    args.pending_logs = []
+
+    # keep for ffmpeg testing
+    # if platform.system() == 'Windows':
+    #     mediainfo = os.path.join(args.tool_path, "MediaInfo.exe")
+    # else:
+    #     mediainfo = 'mediainfo'
+
+    tools = select_tools(args)
+
+    output_path = os.path.join(args.output, "Color")
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+
+    input_cache = None
+    if args.input_cache:
+        input_cache = InputCache(
+            args.input_cache, int(args.input_cache_size * 1024 ** 3)
+        )
+    elif "Encoder" in args.test_group:
+        # generated inputs are shared by cases of the run at least
+        input_cache = InputCache(
+            os.path.join(args.output, RUN_INPUTS_DIR),
+            int(args.input_cache_size * 1024 ** 3)
+        )
+
+    scratch = None
+    if args.scratch:
+        scratch = ScratchArea(args.scratch, int(args.scratch_size * 1024 ** 3))  # noqa: E501
+
+    if args.admission_control and not admission:
+        admission = AdmissionController(
+            args.output, disk_reserve=int(args.disk_reserve * 1024 ** 3),
+            memory_reserve=int(args.memory_reserve * 1024 ** 3)
+        )
+
+    result_store = None
+    if args.incremental:
+        result_store = ResultStore(args.incremental)
+
+    finished_cases = set()
+    if args.journal:
+        journal_path = os.path.join(args.output, JOURNAL_NAME)
+        if args.resume:
+            finished_cases = {
+                name for name, status in read_journal(journal_path).items()
+                if status in FINAL_STATUSES
+            }
+            main_logger.info(f"Resume run. Finished cases: {len(finished_cases)}")  # noqa: E501
+        args.case_journal = CaseJournal(
+            journal_path, test_cases_path, resume=args.resume
+        )
+
+    selected_cases = [
+        x for x in cases
+        if not is_case_skipped(x, current_conf) and x['case'] not in finished_cases  # noqa: E501
+    ]
+
+    # progress of the group is visible while it runs
+    args.report_aggregator = ReportAggregator(
+        args.output, len(selected_cases), resume=args.resume
+    )
+
+    # groups which run at the same time share gauges
+    QUEUED_CASES.inc(len(selected_cases))
+
+    timing_db = None
+    if args.timing_db:
+        timing_db = TimingDB(args.timing_db, args.test_group, get_build_id(tools))  # noqa: E501
+        expected_times = timing_db.get_expected_times()
+        # cases without history are estimated by their keys
+        costs = get_case_costs(selected_cases, expected_times)
+
+        if args.jobs > 1:
+            # the longest cases go first, so workers finish at close times
+            selected_cases.sort(key=lambda x: -costs[x['case']])
+
+        if any(x['case'] in expected_times for x in selected_cases):
+            predicted_time = max(sum(costs.values()) / args.jobs, max(costs.values()))  # noqa: E501
+            main_logger.info(f"Predicted time of the group: {predicted_time:.0f} s")  # noqa: E501
+            if predicted_time > args.group_budget:
+                main_logger.warning(
+                    f"Group {args.test_group} is likely to exceed its time budget: "  # noqa: E501
+                    f"{predicted_time:.0f} s > {args.group_budget:.0f} s"
+                )
+
+    if args.fifo_outputs and not hasattr(os, "mkfifo"):
+        main_logger.warning("Named pipes aren't supported. Outputs will be saved to files")  # noqa: E501
+        args.fifo_outputs = False
+
+    if args.jobs > 1:
+        main_logger.info(f"Run {len(selected_cases)} cases with {args.jobs} workers")  # noqa: E501
+        # cases don't share any files, so they can run independently.
+        # Tools of the same case are still executed one after another
+        # workers of groups which run at the same time are named after them
+        prefix = "case"
+        if threading.current_thread() is not threading.main_thread():
+            prefix = f"{threading.current_thread().name}_case"
+        with ThreadPoolExecutor(max_workers=args.jobs,
+                                thread_name_prefix=prefix) as executor:
+            results = list(executor.map(
+                lambda case: execute_case(args, case, cases, tools,
+                                          input_cache, result_store,
+                                          timing_db, scratch, admission),
+                selected_cases
+            ))
+    else:
+        results = [
+            execute_case(args, case, cases, tools, input_cache, result_store,
+                         timing_db, scratch, admission)
+            for case in selected_cases
+        ]
+
+    # logs are converted on a background thread
+    wait_for_logs(args.pending_logs)
+
+    if args.journal:
+        args.case_journal.close(cases)
+
+    args.report_aggregator.close()
+
+    if timing_db:
+        timing_db.close()
+
+    if scratch:
+        scratch.close()
+
+    if input_cache and not args.input_cache:
+        shutil.rmtree(input_cache.root, ignore_errors=True)
+
+    if any(result != 0 for result in results):
+        rc = -1
+
+    return rc
+
+
+def run_group(args, system_info: SystemInfo,
+              admission: Optional[AdmissionController] = None) -> int:
+    if threading.current_thread() is not threading.main_thread():
+        # logs and traces of groups which run at the same time are told
+        # apart by names of their threads
+        threading.current_thread().name = args.test_group
+
     main_logger.info('run_tests starts working...')
     main_logger.info(f'tests run with following args: {args}')
 
@@ -341,17 +823,76 @@ def run_tests(args):
         if not os.path.exists(os.path.join(args.output, "tool_logs")):
             os.makedirs(os.path.join(args.output, "tool_logs"))
 
-        render_device = get_gpu()
-        system_pl = platform.system()
-        current_conf = set(system_pl) if not render_device else {system_pl, render_device}  # noqa: E501
-        main_logger.info(f"Detected GPUs: {render_device}")
+        current_conf = system_info.conf
+        main_logger.info(f"Detected GPUs: {system_info.render_device}")
         main_logger.info(f"PC conf: {current_conf}")
         main_logger.info("Creating predefined errors json...")
 
-        copy_test_cases(args)
-        prepare_empty_reports(args, current_conf)
-        exit(execute_tests(args, current_conf))
+        with span(args.test_group, "group"):
+            copy_test_cases(args)
+            prepare_empty_reports(args, current_conf)
+            return execute_tests(args, current_conf, admission)
+    except SystemExit as e:
+        # copy_test_cases exits if cases can't be loaded
+        main_logger.error(f"Test group {args.test_group} exited with code {e.code}")  # noqa: E501
+        return -1
     except Exception as e:
         main_logger.error(f"Failed during script execution. Exception: {str(e)}")  # noqa: E501
         main_logger.error(f"Traceback: {traceback.format_exc()}")
-        exit(-1)
+        return -1
+
+
+def run_groups(groups_args: List[Namespace], parallel: int = 1) -> int:
+    """Run test groups in one process, one after another or at the same time.
+
+    System info, tracing, metrics and admission control are set up once and
+    shared by groups. Their options are taken from the first group.
+    """
+    args = groups_args[0]
+    groups = ",".join(x.test_group for x in groups_args)
+
+    system_info = get_system_info(args.system_info_cache, args.system_info_ttl)  # noqa: E501
+
+    if args.trace:
+        start_tracing(args.trace, groups)
+
+    set_const_labels(group=groups)
+    metrics_exporter = None
+    if args.metrics_port or args.metrics_textfile:
+        metrics_exporter = MetricsExporter(
+            port=args.metrics_port, address=args.metrics_address,
+            textfile=args.metrics_textfile
+        )
+
+    admission = None
+    if args.admission_control:
+        # groups which run at the same time share resources of the machine
+        os.makedirs(args.output, exist_ok=True)
+        admission = AdmissionController(
+            args.output, disk_reserve=int(args.disk_reserve * 1024 ** 3),
+            memory_reserve=int(args.memory_reserve * 1024 ** 3)
+        )
+
+    try:
+        if parallel > 1 and len(groups_args) > 1:
+            main_logger.info(f"Run groups {groups} with {parallel} workers")  # noqa: E501
+            with ThreadPoolExecutor(max_workers=parallel,
+                                    thread_name_prefix="group") as executor:
+                results = list(executor.map(
+                    lambda x: run_group(x, system_info, admission), groups_args  # noqa: E501
+                ))
+        else:
+            results = [run_group(x, system_info, admission) for x in groups_args]  # noqa: E501
+    finally:
+        if metrics_exporter:
+            metrics_exporter.close()
+        stop_tracing()
+
+    for group_args, result in zip(groups_args, results):
+        main_logger.info(f"Test group {group_args.test_group} finished with code {result}")  # noqa: E501
+
+    return 0 if all(result == 0 for result in results) else -1
+
+
+def run_tests(args):
+    exit(run_groups([args]))
@@ -1,12 +1,13 @@
 import os
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, NamedTuple, Tuple
 
-from utils import prepare_keys
+from capture import create_fifo
+from utils import get_iterated_streams, prepare_keys
 
 
 def prepare_scaler_parameters(
     case: Dict[str, Any], *, output_path: str = '',
-    simple_scaler: bool = False
+    simple_scaler: bool = False, fifo: bool = False
 ) -> Tuple[str, str, str]:
     input_stream = os.path.relpath(
         os.path.join(output_path, f"{case['case']}.yuv")
@@ -29,9 +30,48 @@ def prepare_scaler_parameters(
             iterate=True, extension='yuv'
         )
         case['prepared_keys_xma'] = prepared_keys
+
+    # raw outputs are hashed while the scaler writes them into named pipes
+    if fifo:
+        keys = case['simple_parameters' if simple_scaler else 'xma_parameters']
+        for stream in get_iterated_streams(keys, output_stream, 'yuv'):
+            create_fifo(stream)
+
     return prepared_keys, input_stream, output_stream
 
 
+class ScalerOutput(NamedTuple):
+    """Outputs of simple and ma35 scalers for the same resolution."""
+    simple: str
+    ma35: str
+    format: Tuple[int, int, str]
+    # number of the output in keys of tools (1, 2, ...)
+    index: int
+
+
+def get_scaler_outputs(case: Dict[str, Any], output_stream: str,
+                       reference_stream: str) -> List[ScalerOutput]:
+    """Pair outputs of simple and ma35 scalers in order of their keys.
+
+    Outputs are numbered by prepare_keys(iterate=True) in order of
+    '<output_stream>' placeholders, so outputs with the same number have the
+    same resolution.
+    """
+    simple_outputs = get_iterated_streams(case['simple_parameters'], output_stream, 'yuv')  # noqa: E501
+    ma35_outputs = get_iterated_streams(case['xma_parameters'], reference_stream, 'yuv')  # noqa: E501
+    formats = get_output_formats(case['xma_parameters'])
+
+    if not len(simple_outputs) == len(ma35_outputs) == len(formats):
+        raise ValueError(
+            f"Case {case['case']} has {len(simple_outputs)} simple and {len(ma35_outputs)} ma35 outputs"  # noqa: E501
+        )
+
+    return [
+        ScalerOutput(simple, ma35, output_format, index)
+        for index, (simple, ma35, output_format) in enumerate(zip(simple_outputs, ma35_outputs, formats), 1)  # noqa: E501
+    ]
+
+
 def get_video_size(keys: str, count: int) -> str:
     keys = keys.split()
 
@@ -43,3 +83,48 @@ def get_video_size(keys: str, count: int) -> str:
 
         # update list to find the next ocurrance of <output_stream>
         keys = keys[index+1:]
+
+
+def get_output_formats(keys: str) -> List[Tuple[int, int, str]]:
+    """Get (width, height, pix_fmt) of each output from ma35 scaler keys.
+
+    Output options precede their '-o' key in ma35 scaler keys
+    ('-pix_fmt yuv420p -w 1280 -h 720 -o <output_stream>').
+    """
+    keys = keys.split()
+    formats = []
+    width, height, pix_fmt = 0, 0, 'yuv420p'
+
+    for index, key in enumerate(keys[:-1]):
+        value = keys[index+1]
+        if key == '-w':
+            width = int(value)
+        elif key == '-h':
+            height = int(value)
+        elif key == '-pix_fmt':
+            pix_fmt = value
+        elif key == '-o':
+            formats.append((width, height, pix_fmt))
+
+    return formats
+
+
+def get_input_format(keys: str) -> Tuple[int, int, str]:
+    """Get (width, height, pix_fmt) of input from ma35 scaler keys.
+
+    Input options precede '-i' key in ma35 scaler keys
+    ('-pix_fmt yuv420p -w 720 -h 480 -i <input_stream>').
+    """
+    keys = keys.split()
+    width, height, pix_fmt = 0, 0, 'yuv420p'
+
+    for index, key in enumerate(keys[:keys.index('-i')]):
+        value = keys[index+1]
+        if key == '-w':
+            width = int(value)
+        elif key == '-h':
+            height = int(value)
+        elif key == '-pix_fmt':
+            pix_fmt = value
+
+    return width, height, pix_fmt
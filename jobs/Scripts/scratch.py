@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+from jobs_launcher.core.config import main_logger
+
+
+class ScratchArea:
+    """Fast storage (e.g. /dev/shm) for artifacts of running cases.
+
+    Each case gets its own directory if its estimated artifacts fit into
+    the remaining budget. Otherwise the case works on the results volume.
+    """
+
+    def __init__(self, root: str, budget: int = 0):
+        os.makedirs(root, exist_ok=True)
+        # runs on the same machine don't share directories of cases
+        self.root = tempfile.mkdtemp(prefix="scratch_", dir=root)
+        # half of free space is used by default, the rest is left to tools
+        self.budget = budget or shutil.disk_usage(root).free // 2
+        self.used = 0
+        self._lock = threading.Lock()
+
+        main_logger.info(f"Scratch area {self.root}, budget {self.budget / 1024 ** 3:.1f} GB")  # noqa: E501
+
+    def allocate(self, name: str, size: int) -> Optional[str]:
+        """Get directory for artifacts of a case or None if they don't fit."""
+        with self._lock:
+            if not size or self.used + size > self.budget:
+                return None
+            self.used += size
+
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def release(self, name: str, size: int,
+                keep_path: Optional[str] = None) -> None:
+        """Free directory of a case.
+
+        Args:
+            name (str): Name of the case
+            size (int): Size which was allocated for the case
+            keep_path (str, optional): Directory where remaining artifacts
+                are moved. They are removed if it isn't set
+        """
+        path = os.path.join(self.root, name)
+
+        if keep_path and os.path.isdir(path):
+            for file_name in os.listdir(path):
+                keep_artifact(os.path.join(path, file_name), keep_path)
+
+        shutil.rmtree(path, ignore_errors=True)
+
+        with self._lock:
+            self.used -= size
+
+    def close(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def keep_artifact(artifact_path: str, directory: str) -> str:
+    """Move an artifact to directory and get its new path."""
+    if not os.path.isfile(artifact_path):
+        return artifact_path
+
+    destination = os.path.relpath(
+        os.path.join(directory, os.path.basename(artifact_path))
+    )
+    shutil.move(artifact_path, destination)
+    return destination
@@ -0,0 +1,111 @@
+import json
+import os
+import re
+import statistics
+from typing import Any, Dict, List, Tuple
+
+from make_compare_report import collect_reports
+from supervisor import get_max_resolution
+
+# relative cost of processing of one pixel by codec
+CODEC_COSTS = {'av1': 2.0, 'hevc': 1.5, 'h264': 1.0}
+DEFAULT_FPS = 30
+
+FPS_PATTERN = re.compile(r'(?:^|\s)--?(?:fps|framerate)\s+(\d+)')
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parse 'i/N' where i is the number of a shard from 1 to N."""
+    index, _, count = shard.partition('/')
+    index, count = int(index), int(count)
+
+    if not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {shard}, expected i/N with 1 <= i <= N")  # noqa: E501
+
+    return index, count
+
+
+def estimate_case_cost(case: Dict[str, Any]) -> float:
+    """Estimate relative cost of a case from keys of its tools.
+
+    Frame counts aren't set in cases. Streams of cases have the same
+    duration, so frame rate is used instead.
+    """
+    cost = 0.0
+
+    for field in ('simple_parameters', 'xma_parameters', 'prepare'):
+        keys = case.get(field)
+        if not keys:
+            continue
+
+        fps = max([int(x) for x in FPS_PATTERN.findall(keys)], default=DEFAULT_FPS)  # noqa: E501
+        codec = max(
+            [value for name, value in CODEC_COSTS.items() if name in keys.lower()],  # noqa: E501
+            default=1.0
+        )
+        outputs = max(1, keys.split().count('-o'))
+        cost += get_max_resolution(keys) * fps * codec * outputs
+
+    return cost
+
+
+def load_history(path: str) -> Dict[str, float]:
+    """Get execution time of cases from reports of a previous run.
+
+    Args:
+        path (str): report_compare.json or a directory with case reports
+    """
+    if os.path.isdir(path):
+        reports = collect_reports([path])
+    else:
+        with open(path, 'r') as file:
+            reports = json.load(file)
+
+    return {
+        report['test_case']: report['execution_time'] for report in reports
+        if report.get('execution_time') and report.get('test_status') != 'skipped'  # noqa: E501
+    }
+
+
+def get_case_costs(cases: List[Dict[str, Any]],
+                   history: Dict[str, float]) -> Dict[str, float]:
+    """Get cost of cases in seconds if possible.
+
+    Execution time from history is used if it's known. Estimates of other
+    cases are scaled to seconds by the median ratio of known time to
+    estimate.
+    """
+    estimates = {case['case']: estimate_case_cost(case) for case in cases}
+
+    ratios = [
+        history[name] / estimate for name, estimate in estimates.items()
+        if name in history and estimate > 0
+    ]
+    scale = statistics.median(ratios) if ratios else 1.0
+
+    return {
+        name: history.get(name, estimate * scale)
+        for name, estimate in estimates.items()
+    }
+
+
+def select_shard(cases: List[Dict[str, Any]], shard: str,
+                 history: Dict[str, float]) -> List[Dict[str, Any]]:
+    """Get cases of a shard.
+
+    Cases are distributed by the longest processing time first rule: the
+    most expensive of the remaining cases goes to the least loaded shard.
+    The result depends only on cases and history, so all nodes get the same
+    partition. Order of cases is kept.
+    """
+    index, count = parse_shard(shard)
+    costs = get_case_costs(cases, history)
+
+    loads = [0.0] * count
+    assignment = {}
+    for name in sorted(costs, key=lambda x: (-costs[x], x)):
+        target = min(range(count), key=lambda x: (loads[x], x))
+        loads[target] += costs[name]
+        assignment[name] = target
+
+    return [case for case in cases if assignment[case['case']] == index - 1]
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import re
+import signal
+import threading
+import time
+from subprocess import PIPE, Popen
+from typing import IO, Any, Callable, Dict, List, Optional, Union
+
+from jobs_launcher.core.config import main_logger
+
+# time given to a tool to exit after SIGTERM before it's killed
+KILL_GRACE_PERIOD = 5
+# time given to read the rest of tool output after it exited
+DRAIN_TIMEOUT = 5
+
+FHD_PIXELS = 1920 * 1080
+# seconds between reads of peak RSS of a running tool
+RSS_SAMPLE_INTERVAL = 0.1
+
+
+def _get_values(keys_list: List[str], is_key: Callable[[str], bool]) -> List[int]:  # noqa: E501
+    return [
+        int(keys_list[i+1]) for i, key in enumerate(keys_list[:-1])
+        if is_key(key) and keys_list[i+1].isdigit()
+    ]
+
+
+def get_max_resolution(keys: str) -> int:
+    """Get the largest frame (in pixels) mentioned in keys of a tool."""
+    pixels = [
+        int(width) * int(height)
+        for width, height in re.findall(r'\b(\d{2,5})x(\d{2,5})\b', keys)
+    ]
+
+    keys_list = keys.split()
+    widths = _get_values(keys_list, lambda x: x == '-w' or x.endswith('_width'))  # noqa: E501
+    heights = _get_values(keys_list, lambda x: x == '-h' or x.endswith('_height'))  # noqa: E501
+    pixels += [width * height for width, height in zip(widths, heights)]
+
+    return max(pixels, default=FHD_PIXELS)
+
+
+def get_tool_timeout(keys: str, fhd_timeout: float,
+                     case_deadline: Optional[float] = None) -> Optional[float]:
+    """Get timeout of a tool run from its keys.
+
+    Args:
+        keys (str): Prepared keys of the tool
+        fhd_timeout (float): Timeout of a tool which processes one FHD
+            stream. It's scaled by the largest frame size and the number of
+            outputs. 0 disables the timeout
+        case_deadline (float, optional): time.monotonic() value when the
+            whole case must be finished
+
+    Returns:
+        Optional[float]: Timeout in seconds or None if there is no timeout
+    """
+    timeout = None
+
+    if fhd_timeout:
+        scale = max(1.0, get_max_resolution(keys) / FHD_PIXELS)
+        outputs = max(1, keys.split().count('-o'))
+        timeout = fhd_timeout * scale * outputs
+
+    if case_deadline is not None:
+        remaining = max(0.0, case_deadline - time.monotonic())
+        timeout = remaining if timeout is None else min(timeout, remaining)
+
+    return timeout
+
+
+def _signal_group(process: Popen, sig: int) -> None:
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _read_peak_rss(pid: int) -> Optional[int]:
+    # VmHWM is in KB. It isn't available on other platforms and after the
+    # process exited
+    try:
+        with open(f"/proc/{pid}/status", "r") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _sample_peak_rss(pid: int, usage: Dict[str, Any],
+                     stopped: threading.Event) -> None:
+    while True:
+        rss = _read_peak_rss(pid)
+        if rss is not None:
+            usage["max_rss"] = max(usage["max_rss"] or 0, rss)
+        if stopped.wait(RSS_SAMPLE_INTERVAL):
+            return
+
+
+def _wait(process: Popen, usage: Dict[str, Any]) -> int:
+    start_time = time.monotonic()
+
+    # ru_maxrss of a forked child keeps RSS of the runner before exec, so
+    # peak RSS of the tool itself is sampled while it runs
+    usage["max_rss"] = None
+    stopped = threading.Event()
+    sampler = threading.Thread(target=_sample_peak_rss, name="rss_sampler",
+                               args=(process.pid, usage, stopped))
+    sampler.start()
+    try:
+        # the exited process isn't reaped yet, so its pid can't be reused
+        # while the sampler reads it
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+    finally:
+        stopped.set()
+        sampler.join()
+
+    _, status, rusage = os.wait4(process.pid, 0)
+    # Popen mustn't try to reap the process again
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    usage["wall_time"] = time.monotonic() - start_time
+    # resources of reaped children of the tool (e.g. of the shell) are included
+    usage["user_time"] = rusage.ru_utime
+    usage["system_time"] = rusage.ru_stime
+    usage["exit_code"] = process.returncode
+
+    return process.returncode
+
+
+async def _drain(pipe: IO[bytes], file: IO[bytes]) -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe
+    )
+
+    try:
+        while True:
+            chunk = await reader.read(64 * 1024)
+            if not chunk:
+                break
+            file.write(chunk)
+    finally:
+        transport.close()
+
+
+async def _terminate(process: Popen, wait: asyncio.Future) -> None:
+    _signal_group(process, signal.SIGTERM)
+
+    try:
+        await asyncio.wait_for(asyncio.shield(wait), KILL_GRACE_PERIOD)
+    except asyncio.TimeoutError:
+        main_logger.warning(f"Process {process.pid} ignored SIGTERM. Kill it")  # noqa: E501
+        _signal_group(process, signal.SIGKILL)
+        await wait
+
+
+async def supervise(command: Union[str, List[str]], log: str, *,
+                    shell: bool = False,
+                    timeout: Optional[float] = None,
+                    usage: Optional[Dict[str, Any]] = None) -> int:
+    """Run a command, write its stdout and stderr to log and wait for it.
+
+    The command is started in a new process group. The whole group is
+    terminated if timeout expires or if the awaiting task is cancelled,
+    then asyncio.TimeoutError or asyncio.CancelledError is raised.
+
+    If usage is given, wall time, user and system CPU time, max RSS and exit
+    code of the command are written there, even if it was terminated. Max
+    RSS (KB) is VmHWM of the started process (not of its children) sampled
+    every RSS_SAMPLE_INTERVAL, it's None where /proc isn't available.
+
+    Returns:
+        int: Exit code of the command
+    """
+    loop = asyncio.get_running_loop()
+
+    with open(log, 'wb') as file:
+        process = Popen(command, stdout=PIPE, stderr=PIPE, shell=shell,
+                        start_new_session=True)
+        drains = [
+            asyncio.ensure_future(_drain(process.stdout, file)),
+            asyncio.ensure_future(_drain(process.stderr, file))
+        ]
+        wait = loop.run_in_executor(
+            None, _wait, process, usage if usage is not None else {}
+        )
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(wait), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            await _terminate(process, wait)
+            raise
+        finally:
+            # children of the tool mustn't outlive it and keep pipes open
+            _signal_group(process, signal.SIGKILL)
+            _, pending = await asyncio.wait(drains, timeout=DRAIN_TIMEOUT)
+            for drain in pending:
+                drain.cancel()
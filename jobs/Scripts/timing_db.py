@@ -0,0 +1,147 @@
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from bench_stats import percentile
+from utils import get_file_hash
+
+# number of the latest runs of a case which are used for predictions
+HISTORY_DEPTH = 20
+# timeouts aren't predicted from fewer runs
+MIN_RUNS = 3
+# predicted timeouts of short cases would be too sensitive to jitter
+MIN_PREDICTED_TIMEOUT = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS case_runs (
+    id INTEGER PRIMARY KEY,
+    test_group TEXT NOT NULL,
+    case_name TEXT NOT NULL,
+    build TEXT NOT NULL,
+    status TEXT NOT NULL,
+    -- all tries of the case
+    execution_time REAL NOT NULL,
+    recorded REAL NOT NULL,
+    -- the last try of the case
+    try_time REAL
+);
+CREATE INDEX IF NOT EXISTS case_runs_case
+    ON case_runs (test_group, case_name, build);
+CREATE TABLE IF NOT EXISTS phase_runs (
+    run_id INTEGER NOT NULL REFERENCES case_runs (id),
+    phase TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+"""
+
+
+def get_build_id(tools: Dict[str, str]) -> str:
+    """Get identifier of the build of tools from their hashes."""
+    return "-".join(get_file_hash(path)[:8] for _, path in sorted(tools.items()))  # noqa: E501
+
+
+class TimingDB:
+    """Durations of cases and their phases recorded across runs.
+
+    Durations are stored in SQLite database by test group, case and build of
+    tools. Durations of the same build are preferred for predictions, other
+    builds are used if there are not enough of them.
+
+    Cases are ordered by durations of all their tries, while timeouts are
+    predicted from durations of single tries, because timeouts limit tries.
+    """
+
+    def __init__(self, path: str, test_group: str, build: str):
+        self.test_group = test_group
+        self.build = build
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # workers of a run share the connection, nodes can share the file
+        self._connection = sqlite3.connect(path, check_same_thread=False,
+                                           timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._migrate()
+
+        self._history = self._load_history("execution_time")
+        self._try_history = self._load_history("try_time")
+
+    def _migrate(self) -> None:
+        columns = [
+            row[1] for row in
+            self._connection.execute("PRAGMA table_info(case_runs)")
+        ]
+        # databases of older versions have only durations of whole cases
+        if "try_time" not in columns:
+            with self._connection:
+                self._connection.execute(
+                    "ALTER TABLE case_runs ADD COLUMN try_time REAL"
+                )
+
+    def _load_history(self, column: str) -> Dict[str, List[float]]:
+        rows = self._connection.execute(
+            f"SELECT case_name, build, {column} FROM case_runs "
+            "WHERE test_group = ? AND status IN ('passed', 'failed') "
+            f"AND {column} IS NOT NULL ORDER BY recorded DESC",
+            (self.test_group,)
+        ).fetchall()
+
+        same_build: Dict[str, List[float]] = {}
+        other_builds: Dict[str, List[float]] = {}
+        for case_name, build, duration in rows:
+            target = same_build if build == self.build else other_builds
+            durations = target.setdefault(case_name, [])
+            if len(durations) < HISTORY_DEPTH:
+                durations.append(duration)
+
+        history = {}
+        for case_name in set(same_build) | set(other_builds):
+            durations = same_build.get(case_name, [])
+            if len(durations) < MIN_RUNS:
+                durations = (durations + other_builds.get(case_name, []))[:HISTORY_DEPTH]  # noqa: E501
+            history[case_name] = durations
+
+        return history
+
+    def get_expected_times(self) -> Dict[str, float]:
+        """Get median time of all tries of cases with known history."""
+        return {
+            case_name: statistics.median(durations)
+            for case_name, durations in self._history.items()
+        }
+
+    def predict_timeout(self, case_name: str, factor: float) -> Optional[float]:  # noqa: E501
+        """Get timeout of a try of a case as p99 of its tries times factor."""
+        durations = self._try_history.get(case_name, [])
+        if len(durations) < MIN_RUNS:
+            return None
+        return max(MIN_PREDICTED_TIMEOUT, percentile(durations, 99) * factor)
+
+    def record(self, case: Dict[str, Any], status: str,
+               execution_time: float,
+               try_time: Optional[float] = None) -> None:
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO case_runs (test_group, case_name, build, status, "
+                "execution_time, recorded, try_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.test_group, case["case"], self.build, status,
+                 execution_time, time.time(), try_time)
+            )
+            self._connection.executemany(
+                "INSERT INTO phase_runs (run_id, phase, duration) VALUES (?, ?, ?)",  # noqa: E501
+                [
+                    (cursor.lastrowid, phase, duration)
+                    for phase, duration in case.get("phase_times", {}).items()
+                ]
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
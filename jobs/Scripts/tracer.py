@@ -0,0 +1,120 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+_tracer: Optional["Tracer"] = None
+
+
+class Tracer:
+    """Spans of a run in Chrome trace event format.
+
+    The trace can be opened in Perfetto (ui.perfetto.dev) or chrome://tracing.
+    Each thread (e.g. worker of cases) is a separate track. Tools which run at
+    the same time in one thread get tracks of their own.
+    """
+
+    def __init__(self, path: str, process_name: str = ""):
+        self.path = path
+        self._pid = os.getpid()
+        self._start_time = time.perf_counter()
+        self._events: List[Dict[str, Any]] = []
+        self._tracks: Dict[Tuple[int, str, str], int] = {}
+        self._lock = threading.Lock()
+
+        if process_name:
+            self._events.append({
+                "name": "process_name", "ph": "M", "pid": self._pid,
+                "tid": 0, "args": {"name": process_name}
+            })
+
+    def _get_tid(self, track: str) -> int:
+        # called under the lock. Renamed threads get new tracks
+        name = threading.current_thread().name
+        key = (threading.get_ident(), name, track)
+        tid = self._tracks.get(key)
+        if tid is None:
+            tid = self._tracks[key] = len(self._tracks) + 1
+            self._events.append({
+                "name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                "args": {"name": f"{name} {track}" if track else name}
+            })
+            self._events.append({
+                "name": "thread_sort_index", "ph": "M", "pid": self._pid,
+                "tid": tid, "args": {"sort_index": tid}
+            })
+        return tid
+
+    def add_span(self, name: str, start_time: float, end_time: float,
+                 category: str = "", track: str = "", **args: Any) -> None:
+        """Add a span measured with time.perf_counter()."""
+        event = {
+            "name": name, "cat": category or "run", "ph": "X",
+            "pid": self._pid,
+            "ts": round((start_time - self._start_time) * 1e6, 3),
+            "dur": round((end_time - start_time) * 1e6, 3)
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+
+        with self._lock:
+            event["tid"] = self._get_tid(track)
+            self._events.append(event)
+
+    def close(self) -> None:
+        with self._lock:
+            events = list(self._events)
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        os.replace(temp_path, self.path)
+
+
+def start_tracing(path: str, process_name: str = "") -> Tracer:
+    global _tracer
+    _tracer = Tracer(path, process_name)
+    return _tracer
+
+
+def stop_tracing() -> None:
+    global _tracer
+    if _tracer:
+        _tracer.close()
+        _tracer = None
+
+
+def add_span(name: str, start_time: float, end_time: float,
+             category: str = "", track: str = "", **args: Any) -> None:
+    if _tracer:
+        _tracer.add_span(name, start_time, end_time, category, track, **args)
+
+
+@contextmanager
+def span(name: str, category: str = "", track: str = "",
+         **args: Any) -> Iterator[None]:
+    """Trace the block as a span. Nothing is measured if tracing is off."""
+    if not _tracer:
+        yield
+        return
+
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_span(name, start_time, time.perf_counter(), category, track, **args)  # noqa: E501
+
+
+def traced(func: Callable) -> Callable:
+    """Trace calls of the function as spans named after it."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _tracer:
+            return func(*args, **kwargs)
+        with span(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
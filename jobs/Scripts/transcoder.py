@@ -1,7 +1,8 @@
 import os
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 from encoder import run_tool
+from input_cache import InputCache
 from utils import prepare_keys, select_extension
 
 
@@ -36,8 +37,15 @@ def prepare_transcoder_parameters(
 
 
 def prepare_transcoder_input(
-    case: Dict[str, Any], encoder: str, output_stream: str, log: str
+    case: Dict[str, Any], encoder: str, output_stream: str, log: str,
+    error_messages: set, *, cache: Optional[InputCache] = None,
+    timeout: Optional[float] = None
 ) -> None:
-    encoder_keys = prepare_keys(case['prepare'], '', output_stream)
+    def _encode(stream: str) -> None:
+        encoder_keys = prepare_keys(case['prepare'], '', stream)
+        run_tool(encoder, encoder_keys, log, error_messages, timeout=timeout)
 
-    run_tool(encoder, encoder_keys, log)
+    if cache:
+        cache.prepare(encoder, case['prepare'], output_stream, _encode, log)
+    else:
+        _encode(output_stream)
@@ -1,17 +1,64 @@
+import copy
+import hashlib
 import json
 import os
+import shlex
+import threading
+import time
 import traceback
 from argparse import Namespace
 from datetime import datetime
 from shutil import copyfile
-from typing import Any, Dict, List, Set, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from xml.etree import ElementTree
+
+from case_matrix import MATRIX_NAME, load_cases
+from journal import FINAL_STATUSES, read_journal
+from log_converter import submit_log
+from platform_probe import get_system_info
+from sharding import load_history, select_shard
+from tracer import add_span, traced
 
 from jobs_launcher.common.scripts.script_info_by_platform import \
     get_script_info  # noqa: E501
 from jobs_launcher.common.scripts.status_by_platform import get_status
 from jobs_launcher.core.config import (CASE_REPORT_SUFFIX,  # noqa: E501
                                        VIDEO_KEY, main_logger)
-from jobs_launcher.core.system_info import get_gpu
+
+# cases can be executed by several workers at the same time, but all of them
+# share test_cases.json, so it must be rewritten by one worker at a time
+_TEST_CASES_LOCK = threading.Lock()
+
+JOURNAL_NAME = "test_cases_journal.jsonl"
+
+# hashes of binaries and streams by their path, size and modification time
+_FILE_HASHES: Dict[Tuple[str, int, int, str], str] = {}
+
+
+class PhaseTimer:
+    """Measure durations of consecutive phases of a case try.
+
+    Start of a phase finishes the previous one. Durations of phases which
+    are started several times are summed up. Each phase is traced as a span.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self._current: Optional[str] = None
+        self._start_time = 0.0
+
+    def start(self, phase: str) -> None:
+        self.stop()
+        self._current = phase
+        self._start_time = time.perf_counter()
+
+    def stop(self) -> None:
+        if self._current:
+            end_time = time.perf_counter()
+            add_span(self._current, self._start_time, end_time, "phase")
+            duration = end_time - self._start_time
+            self.phases[self._current] = self.phases.get(self._current, 0.0) + duration  # noqa: E501
+            self._current = None
 
 
 def is_case_skipped(case: Dict[str, Any], render_platform):
@@ -21,25 +68,28 @@ def is_case_skipped(case: Dict[str, Any], render_platform):
     return sum([render_platform & set(x) == set(x) for x in case.get('skip_on', '')])  # noqa: E501
 
 
+@traced
 def save_logs(args: Namespace, case: Dict[str, Any], log: str):
     try:
-        if 'ma35' in log.lower():
+        if 'bench' in log.lower():
+            # benchmark logs are kept next to logs of the compared run
+            log_name = os.path.splitext(os.path.basename(log))[0]
+            log_destination_path = os.path.join(args.output, "tool_logs", log_name + ".html")  # noqa: E501
+        elif 'ma35' in log.lower():
             log_destination_path = os.path.join(args.output, "tool_logs", case["case"] + "_ma35.html")  # noqa: E501
         elif 'preparation' in log.lower():
             log_destination_path = os.path.join(args.output, "tool_logs", case["case"] + "_input_preparation.html")  # noqa: E501
         else:
             log_destination_path = os.path.join(args.output, "tool_logs", case["case"] + "_simple.html")  # noqa: E501
 
-        with open(log, "r", encoding="utf-8") as file:
-            lines = file.readlines()
-        logs = "<!DOCTYPE html><html><body><span style=\"white-space: pre-line; font-family:'Courier New'\">\n"  # noqa: E501
-        logs += "".join(lines)
-        logs += "</span></body></html>"
-
-        with open(log_destination_path, "w", encoding="utf-8") as file:
-            file.write(logs)
+        if args.compress_logs:
+            log_destination_path += ".gz"
 
-        main_logger.info("Finish logs saving")
+        # list.append is atomic, so workers of the group don't need a lock
+        args.pending_logs.append(submit_log(
+            log, log_destination_path, head_lines=args.log_head_lines,
+            tail_lines=args.log_tail_lines
+        ))
 
     except Exception as e:
         main_logger.error(f"Failed during logs saving. Exception: {str(e)}")
@@ -114,17 +164,33 @@ def prepare_keys(keys: str, input_stream: str, output_stream: str,
     keys = keys.replace("<input_stream>", input_stream)
 
     if iterate:
-        count = keys.count('<output_stream>')
-        for i in range(1, count+1):
-            keys = keys.replace(
-                "<output_stream>", f"{output_stream}_{i}.{extension}", 1
-            )
+        for stream in get_iterated_streams(keys, output_stream, extension):
+            keys = keys.replace("<output_stream>", stream, 1)
     else:
         keys = keys.replace("<output_stream>", output_stream)
 
     return keys
 
 
+def get_iterated_streams(keys: str, output_stream: str,
+                         extension: str = '') -> List[str]:
+    """Get numbered output files which prepare_keys generates for iterate=True.
+
+    Args:
+        keys (str): Template string containing '\<output_stream\>'
+            placeholders
+        output_stream (str): Base file path of output files
+        extension (str, optional): File extension (without dot).
+            Defaults to ''.
+
+    Returns:
+        List[str]: Output files in order of placeholders in keys
+    """
+    count = keys.count('<output_stream>')
+    return [f"{output_stream}_{i}.{extension}" for i in range(1, count+1)]
+
+
+@traced
 def save_results(
     args: Namespace, case: Dict[str, Any], cases: List[Dict[str, Any]],
     execution_time: float = 0.0, test_case_status: str = "",
@@ -136,23 +202,35 @@ def save_results(
 
     test_case_report["execution_time"] = execution_time
 
-    test_case_report["ma35_log"] = os.path.join("tool_logs", case["case"] + "_ma35.html")  # noqa: E501
-    test_case_report["simple_log"] = os.path.join("tool_logs", case["case"] + "_simple.html")  # noqa: E501
+    log_extension = ".html.gz" if args.compress_logs else ".html"
+    test_case_report["ma35_log"] = os.path.join("tool_logs", case["case"] + "_ma35" + log_extension)  # noqa: E501
+    test_case_report["simple_log"] = os.path.join("tool_logs", case["case"] + "_simple" + log_extension)  # noqa: E501
 
     if "Decoder" in args.test_group:
-        test_case_report["preparation_log"] = os.path.join("tool_logs", case["case"] + "_input_preparation.html")  # noqa: E501
+        test_case_report["preparation_log"] = os.path.join("tool_logs", case["case"] + "_input_preparation" + log_extension)  # noqa: E501
 
     test_case_report["testing_start"] = datetime.now().strftime("%m/%d/%Y %H:%M:%S")  # noqa: E501
     test_case_report["number_of_tries"] += 1
 
     test_case_report["message"] = (test_case_report["message"] + list(error_messages))  # noqa: E501
 
-    test_case_report["simple_parameters"] = case["prepared_keys_simple"]
-    test_case_report["xma_parameters"] = case["prepared_keys_xma"]
+    # keys aren't prepared if the case failed before its tools were run
+    test_case_report["simple_parameters"] = case.get("prepared_keys_simple", "")  # noqa: E501
+    test_case_report["xma_parameters"] = case.get("prepared_keys_xma", "")
 
     test_case_report["ref_stream_params"] = case.get("ref_stream_params", {})
     test_case_report["output_stream_params"] = case.get("output_stream_params", {})  # noqa: E501
+    test_case_report["compare_results"] = case.get("compare_results", [])
+    test_case_report["frame_diff"] = case.get("frame_diff", [])
     test_case_report["test_status"] = test_case_status
+    test_case_report["reused"] = case.get("reused", False)
+
+    # simple_wall_time, ma35_max_rss, etc.
+    for tool, usage in case.get("tool_usage", {}).items():
+        for key, value in usage.items():
+            test_case_report[f"{tool}_{key}"] = value
+    test_case_report["phase_times"] = case.get("phase_times", {})
+    test_case_report["performance"] = case.get("performance", {})
 
     if test_case_report["test_status"] in ["passed", "observed", "error"]:
         test_case_report["group_timeout_exceeded"] = False
@@ -172,13 +250,31 @@ def save_results(
     with open(case_report_path, "w") as file:
         json.dump([test_case_report], file, indent=4)
 
-    if test_case_status:
-        case["status"] = test_case_status
-
-    with open(os.path.join(args.output, "test_cases.json"), "w") as file:
-        json.dump(cases, file, indent=4)
+    aggregator = getattr(args, "report_aggregator", None)
+    if aggregator:
+        aggregator.add(test_case_report)
+
+    with _TEST_CASES_LOCK:
+        if test_case_status:
+            case["status"] = test_case_status
+
+        # workers change nested fields of their running cases (usage of
+        # tools, compare results) without the lock, so cases are serialized
+        # from copies taken when they were saved. Tools of the saved case
+        # are finished, so it doesn't change while it's copied
+        args.saved_cases[case["case"]] = copy.deepcopy(case)
+        saved_cases = list(args.saved_cases.values())
+
+        journal = getattr(args, "case_journal", None)
+        if journal:
+            # test_cases.json is rebuilt from time to time by the journal
+            journal.record(case, saved_cases)
+        else:
+            with open(os.path.join(args.output, "test_cases.json"), "w") as file:  # noqa: E501
+                json.dump(saved_cases, file, indent=4)
 
 
+@traced
 def prepare_empty_reports(args: Namespace, current_conf):
     main_logger.info('Create empty report files')
 
@@ -187,7 +283,25 @@ def prepare_empty_reports(args: Namespace, current_conf):
     with open(test_cases, "r") as json_file:
         cases = json.load(json_file)
 
+    # detection of the render device isn't repeated for each case
+    render_device = get_system_info(
+        args.system_info_cache, args.system_info_ttl
+    ).render_device
+
+    finished_cases = {}
+    if getattr(args, "resume", False):
+        finished_cases = {
+            name: status for name, status in read_journal(
+                os.path.join(args.output, JOURNAL_NAME)
+            ).items() if status in FINAL_STATUSES
+        }
+
     for case in cases:
+        if case['case'] in finished_cases:
+            # keep reports of cases which were finished before interruption
+            case['status'] = finished_cases[case['case']]
+            continue
+
         if is_case_skipped(case, current_conf):
             case['status'] = 'skipped'
 
@@ -207,7 +321,7 @@ def prepare_empty_reports(args: Namespace, current_conf):
             test_case_report['render_time'] = 0.0
             test_case_report["number_of_tries"] = 0
             test_case_report["message"] = []
-            test_case_report['render_device'] = get_gpu()
+            test_case_report['render_device'] = render_device
 
             test_case_report['test_case'] = case['case']
             test_case_report['script_info'] = case['script_info']
@@ -232,6 +346,31 @@ def prepare_empty_reports(args: Namespace, current_conf):
         json.dump(cases, f, indent=4)
 
 
+def get_manifest_arguments(test_group: str) -> List[str]:
+    """Get arguments of entrypoint.py from the job manifest of a test group.
+
+    Arguments with placeholders of the launcher (output, tools, etc.) and
+    the test group itself are skipped, so only options specific to the group
+    (e.g. --group_budget) are returned.
+    """
+    manifest_path = os.path.join(
+        os.path.dirname(__file__), '..', 'Tests', test_group,
+        'test.job-manifest.xml'
+    )
+    arguments = []
+
+    for execute in ElementTree.parse(manifest_path).getroot().iter('execute'):  # noqa: E501
+        if 'entrypoint.py' not in execute.get('command', ''):
+            continue
+        for argument in execute.iter('argument'):
+            keys = shlex.split(argument.text or '')
+            if keys and keys[0] != '--test_group' and '{' not in argument.text:  # noqa: E501
+                arguments += keys
+
+    return arguments
+
+
+@traced
 def copy_test_cases(args: Namespace):
     try:
         test_cases_path = os.path.realpath(
@@ -240,27 +379,42 @@ def copy_test_cases(args: Namespace):
                 args.test_group, 'test_cases.json'
             )
         )
+        matrix_path = os.path.join(os.path.dirname(test_cases_path), MATRIX_NAME)  # noqa: E501
         test_cases_copy = os.path.realpath(
             os.path.join(os.path.abspath(args.output), 'test_cases.json')
         )
         main_logger.debug(f"test_cases_copy path: {test_cases_copy}")
 
-        copyfile(test_cases_path, test_cases_copy)
+        if os.path.exists(matrix_path):
+            # only selected cases of a matrix are materialized
+            selected_cases = None
+            if os.path.exists(args.test_cases) and args.test_cases:
+                with open(args.test_cases) as file:
+                    selected_cases = json.load(file)['groups'][args.test_group]  # noqa: E501
+
+            cases = load_cases(matrix_path, selected_cases)
+        else:
+            copyfile(test_cases_path, test_cases_copy)
+
+            with open(test_cases_copy, "r") as json_file:
+                cases = json.load(json_file)
 
-        with open(test_cases_copy, "r") as json_file:
-            cases = json.load(json_file)
+            if os.path.exists(args.test_cases) and args.test_cases:
+                with open(args.test_cases) as file:
+                    test_cases = json.load(file)['groups'][args.test_group]
+                    if test_cases:
+                        necessary_cases = [item for item in cases if item['case'] in test_cases]  # noqa: E501
+                        cases = necessary_cases
 
-        if os.path.exists(args.test_cases) and args.test_cases:
-            with open(args.test_cases) as file:
-                test_cases = json.load(file)['groups'][args.test_group]
-                if test_cases:
-                    necessary_cases = [item for item in cases if item['case'] in test_cases]  # noqa: E501
-                    cases = necessary_cases
+        if args.shard:
+            history = load_history(args.shard_history) if args.shard_history else {}  # noqa: E501
+            cases = select_shard(cases, args.shard, history)
+            main_logger.info(f"Shard {args.shard} has {len(cases)} cases")
 
-            output_cases = os.path.join(args.output, 'test_cases.json')
-            main_logger.debug(f"output_cases path: {output_cases}")
-            with open(output_cases, "w+") as file:
-                json.dump(cases, file, indent=4)
+        output_cases = os.path.join(args.output, 'test_cases.json')
+        main_logger.debug(f"output_cases path: {output_cases}")
+        with open(output_cases, "w+") as file:
+            json.dump(cases, file, indent=4)
 
     except Exception as e:
         main_logger.error('Can\'t load test_cases.json')
@@ -268,6 +422,20 @@ def copy_test_cases(args: Namespace):
         exit(-1)
 
 
+def get_file_hash(path: str, algorithm: str = 'sha1') -> str:
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns, algorithm)
+
+    if key not in _FILE_HASHES:
+        hasher = hashlib.new(algorithm)
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(4 * 1024 * 1024), b''):
+                hasher.update(chunk)
+        _FILE_HASHES[key] = hasher.hexdigest()
+
+    return _FILE_HASHES[key]
+
+
 def remove_artifact(artifact_path: str):
     try:
         if os.path.exists(artifact_path):
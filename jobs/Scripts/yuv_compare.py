@@ -0,0 +1,113 @@
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# pixel format -> (sample type, planes as (name, width and height dividers))
+PIXEL_FORMATS = {
+    'yuv420p': (np.uint8, [('Y', 1, 1), ('U', 2, 2), ('V', 2, 2)]),
+    'yuv420p10le': (np.uint16, [('Y', 1, 1), ('U', 2, 2), ('V', 2, 2)]),
+    # chroma samples are interleaved, so UV plane has the width of luma plane
+    'nv12': (np.uint8, [('Y', 1, 1), ('UV', 1, 2)]),
+    'p010le': (np.uint16, [('Y', 1, 1), ('UV', 1, 2)]),
+}
+
+MACROBLOCK_SIZE = 16
+
+
+def get_planes(width: int, height: int,
+               pix_fmt: str) -> List[Tuple[str, int, int, int, int]]:
+    """Get layout of planes of one raw frame.
+
+    Returns:
+        List[Tuple[str, int, int, int, int]]: (name, width, height, width
+            divider, height divider) of each plane in order of storage
+    """
+    _, planes = PIXEL_FORMATS[pix_fmt]
+    return [
+        (name, -(-width // x_div), -(-height // y_div), x_div, y_div)
+        for name, x_div, y_div in planes
+    ]
+
+
+def get_frame_size(width: int, height: int, pix_fmt: str = 'yuv420p') -> int:
+    """Get size of one raw frame in bytes."""
+    sample_type, _ = PIXEL_FORMATS[pix_fmt]
+    frame_samples = sum(x[1] * x[2] for x in get_planes(width, height, pix_fmt))  # noqa: E501
+    return frame_samples * np.dtype(sample_type).itemsize
+
+
+def locate_frame_difference(
+    video_1: str, video_2: str, width: int, height: int,
+    pix_fmt: str = 'yuv420p'
+) -> Dict[str, Any]:
+    """Find where two raw videos diverge.
+
+    Files are mapped into memory and compared frame by frame, so frames are
+    never copied into Python objects.
+
+    Returns:
+        Dict[str, Any]: number of frames of both videos, number of differing
+            frames, max absolute error and position of the first difference:
+            frame, plane and macroblock (column and row in luma plane)
+    """
+    sample_type, _ = PIXEL_FORMATS[pix_fmt]
+    planes = get_planes(width, height, pix_fmt)
+    frame_samples = sum(x[1] * x[2] for x in planes)
+    frame_size = get_frame_size(width, height, pix_fmt)
+
+    result = {
+        'video_size': f'{width}x{height}', 'pix_fmt': pix_fmt,
+        'frames_1': os.path.getsize(video_1) // frame_size,
+        'frames_2': os.path.getsize(video_2) // frame_size,
+        'differing_frames': 0, 'max_abs_error': 0, 'first_frame': None,
+        'plane': None, 'macroblock_x': None, 'macroblock_y': None
+    }
+
+    frames = min(result['frames_1'], result['frames_2'])
+    if frames == 0:
+        return result
+
+    # int16 is enough to subtract 8 bit samples
+    diff_type = np.int16 if sample_type == np.uint8 else np.int32
+    data_1 = np.memmap(video_1, dtype=sample_type, mode='r',
+                       shape=(frames, frame_samples))
+    data_2 = np.memmap(video_2, dtype=sample_type, mode='r',
+                       shape=(frames, frame_samples))
+
+    for index in range(frames):
+        frame_1 = data_1[index]
+        frame_2 = data_2[index]
+        if np.array_equal(frame_1, frame_2):
+            continue
+
+        result['differing_frames'] += 1
+        error = int(np.abs(np.subtract(frame_1, frame_2, dtype=diff_type)).max())  # noqa: E501
+        result['max_abs_error'] = max(result['max_abs_error'], error)
+
+        if result['first_frame'] is None:
+            result['first_frame'] = index
+            _locate_in_frame(result, frame_1, frame_2, planes)
+
+    return result
+
+
+def _locate_in_frame(result: Dict[str, Any], frame_1: np.ndarray,
+                     frame_2: np.ndarray, planes) -> None:
+    offset = 0
+    for name, plane_width, plane_height, x_div, y_div in planes:
+        plane_samples = plane_width * plane_height
+        plane_1 = frame_1[offset:offset + plane_samples]
+        plane_2 = frame_2[offset:offset + plane_samples]
+        offset += plane_samples
+
+        if np.array_equal(plane_1, plane_2):
+            continue
+
+        first_sample = int(np.argmax(plane_1 != plane_2))
+        y, x = divmod(first_sample, plane_width)
+        # report position of macroblock in luma plane for all planes
+        result['plane'] = name
+        result['macroblock_x'] = x * x_div // MACROBLOCK_SIZE
+        result['macroblock_y'] = y * y_div // MACROBLOCK_SIZE
+        return
@@ -0,0 +1,87 @@
+from typing import Callable, Dict
+
+import numpy as np
+
+from yuv_compare import PIXEL_FORMATS, get_planes
+
+DEFAULT_FRAMES = 60
+DEFAULT_PATTERN = 'gradient'
+
+# samples of these formats keep 10 bit values in the most significant bits
+SAMPLE_SHIFTS = {'p010le': 6}
+
+# pixels which the moving patterns shift per frame
+MOTION = 4
+
+
+def _gradient(x: np.ndarray, y: np.ndarray, frame: int, plane: int,
+              max_value: int) -> np.ndarray:
+    # diagonal ramp moving to the top left corner
+    return (x + y + (frame + plane * 64) * MOTION) % (max_value + 1)
+
+
+def _bars(x: np.ndarray, y: np.ndarray, frame: int, plane: int,
+          max_value: int) -> np.ndarray:
+    # 8 vertical bars of different levels moving to the left
+    width = x.shape[1]
+    bar = ((x + frame * MOTION) * 8 // max(width, 1) + plane * 3) % 8
+    return np.broadcast_to(bar * max_value // 7, (y.shape[0], width))
+
+
+def _noise(x: np.ndarray, y: np.ndarray, frame: int, plane: int,
+           max_value: int) -> np.ndarray:
+    # seeded by position of the plane, so frames are reproducible
+    rng = np.random.default_rng(frame * 4 + plane)
+    return rng.integers(0, max_value + 1, size=(y.shape[0], x.shape[1]))
+
+
+PATTERNS: Dict[str, Callable[..., np.ndarray]] = {
+    'gradient': _gradient,
+    'bars': _bars,
+    'noise': _noise,
+}
+
+
+def get_pattern_key(width: int, height: int, pix_fmt: str, frames: int,
+                    pattern: str) -> str:
+    """Get key of a generated stream for the input cache."""
+    return f"{pattern} {width}x{height} {pix_fmt} {frames}"
+
+
+def generate_pattern(path: str, width: int, height: int,
+                     pix_fmt: str = 'yuv420p', frames: int = DEFAULT_FRAMES,
+                     pattern: str = DEFAULT_PATTERN) -> None:
+    """Write a raw video with a deterministic test pattern.
+
+    The file is mapped into memory and filled frame by frame, so memory use
+    doesn't depend on the number of frames.
+    """
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown pattern {pattern}, expected one of {', '.join(PATTERNS)}")  # noqa: E501
+    if frames < 1:
+        raise ValueError(f"Number of frames must be positive, got {frames}")
+
+    sample_type, _ = PIXEL_FORMATS[pix_fmt]
+    max_value = 255 if np.dtype(sample_type).itemsize == 1 else 1023
+    shift = SAMPLE_SHIFTS.get(pix_fmt, 0)
+    planes = get_planes(width, height, pix_fmt)
+    frame_samples = sum(x[1] * x[2] for x in planes)
+
+    video = np.memmap(path, dtype=sample_type, mode='w+',
+                      shape=(frames, frame_samples))
+    # coordinates are broadcast to the size of a plane by patterns
+    coordinates = [
+        (np.arange(plane_width, dtype=np.int32)[np.newaxis, :], np.arange(plane_height, dtype=np.int32)[:, np.newaxis])  # noqa: E501
+        for _, plane_width, plane_height, _, _ in planes
+    ]
+
+    for frame in range(frames):
+        offset = 0
+        for plane, (x, y) in enumerate(coordinates):
+            samples = x.shape[1] * y.shape[0]
+            values = PATTERNS[pattern](x, y, frame, plane, max_value)
+            video[frame, offset:offset+samples] = (values << shift).ravel()
+            offset += samples
+
+    video.flush()
+    del video